@@ -0,0 +1,109 @@
+"""Running per-cohort aggregates of completed assessments for the facilitator dashboard."""
+from collections import Counter, defaultdict
+import sqlite3
+import threading
+
+from scoring import STYLES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS aggregates (
+    cohort TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (cohort, metric, key)
+);
+"""
+
+
+class CohortAggregates:
+    """Counters updated in constant time per result and persisted to SQLite (WAL mode).
+
+    Each result adds to a fixed number of counters: the cohort total, its
+    dominant-style label, the per-style score sums and one choice count per
+    question. The counters are mirrored in memory, so snapshot() only reads
+    the database when PRAGMA data_version shows that another connection (the
+    API, a kiosk ingest or another replica) has committed since it last looked.
+    """
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self._busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = defaultdict(Counter)
+        self._connection().executescript(SCHEMA)
+        self._refresh()
+
+    def record(self, cohort, scores, dominant_style, responses):
+        """Adds one result: style counts, the dominant-style label and the 0-based choice per question."""
+        self.record_many([(cohort, scores, dominant_style, responses)])
+
+    def record_many(self, results):
+        """Adds (cohort, scores, dominant_style, responses) results in one transaction."""
+        deltas = defaultdict(Counter)
+        for cohort, scores, dominant_style, responses in results:
+            cohort_deltas = deltas[cohort]
+            cohort_deltas[("total", "")] += 1
+            cohort_deltas[("dominant", dominant_style)] += 1
+            for style, score in scores.items():
+                cohort_deltas[("score", style)] += score
+            for q, choice in enumerate(responses):
+                if choice is not None:
+                    cohort_deltas[("choice", f"{q}:{choice}")] += 1
+        # Held across the commit and the mirror update, so a concurrent reload cannot count the deltas twice.
+        with self._lock:
+            with self._connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    "INSERT INTO aggregates (cohort, metric, key, value) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (cohort, metric, key) DO UPDATE SET value = value + excluded.value",
+                    [(cohort, metric, key, value)
+                     for cohort, cohort_deltas in deltas.items()
+                     for (metric, key), value in cohort_deltas.items()],
+                )
+            for cohort, cohort_deltas in deltas.items():
+                self._counters[cohort].update(cohort_deltas)
+
+    def cohorts(self):
+        self._refresh()
+        with self._lock:
+            return sorted(self._counters)
+
+    def snapshot(self, cohort, n_choices=4):
+        """Returns the total, dominant-style distribution, average percentage per style and choice counts."""
+        self._refresh()
+        with self._lock:
+            counters = Counter(self._counters.get(cohort, ()))
+        total = counters[("total", "")]
+        # Every recorded result answers all questions, so the question count follows from the choice keys.
+        n_questions = 1 + max((int(key.split(":")[0]) for metric, key in counters if metric == "choice"), default=-1)
+        dominant = {key: value for (metric, key), value in counters.items() if metric == "dominant"}
+        averages = {
+            style: counters[("score", style)] / (total * n_questions) * 100 if total else 0.0
+            for style in STYLES
+        }
+        choices = [[counters[("choice", f"{q}:{c}")] for c in range(n_choices)] for q in range(n_questions)]
+        return {"total": total, "dominant": dominant, "average_percentages": averages, "choices": choices}
+
+    def _refresh(self):
+        """Reloads the mirror if another connection has committed since this thread's last check."""
+        conn = self._connection()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == getattr(self._local, "data_version", None):
+            return
+        with self._lock:
+            counters = defaultdict(Counter)
+            for cohort, metric, key, value in conn.execute("SELECT cohort, metric, key, value FROM aggregates"):
+                counters[cohort][(metric, key)] = value
+            self._counters = counters
+        self._local.data_version = version
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self._busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
@@ -0,0 +1,270 @@
+"""HTTP API for results submitted outside the Streamlit UI, run alongside the app:
+
+    uvicorn api:app --port 8502
+
+POST /results takes one completed result from the static questionnaire
+(static_export.py), POST /ingest takes a batch of them as NDJSON (one JSON
+result per line, e.g. a kiosk's offline day), GET /questionnaire/<id>
+serves the static page for an instrument, and GET /health reports the
+storage sink. Results are rescored on the server and saved through the
+same outbox, sink and cohort aggregates as the app.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import lru_cache
+import json
+import sqlite3
+import threading
+
+import numpy as np
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import HTMLResponse, JSONResponse
+from starlette.routing import Route
+
+from aggregates import CohortAggregates
+from instruments import INSTRUMENTS_DIR, InstrumentRegistry
+from settings import get_setting
+from static_export import render_bundle
+from submissions import DEFAULT_COHORT, make_sink, make_writer, record_result, save_results, score_results
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_INGEST_BYTES = get_setting("api", "max_ingest_bytes", 32 * 1024 * 1024)
+MAX_COHORT_LENGTH = 100
+EARLIEST_TIMESTAMP = datetime(1970, 1, 1)
+LETTER_INDEX = {letter: i for i, letter in enumerate("ABCD")}
+
+
+@lru_cache(maxsize=None)
+def get_instrument_registry():
+    return InstrumentRegistry(get_setting("instruments", "directory", INSTRUMENTS_DIR))
+
+
+@lru_cache(maxsize=None)
+def get_result_sink():
+    return make_sink()
+
+
+@lru_cache(maxsize=None)
+def get_sheet_writer():
+    return make_writer(get_result_sink())
+
+
+@lru_cache(maxsize=None)
+def get_cohort_aggregates():
+    return CohortAggregates(get_setting("aggregates", "path", "results_aggregates.db"))
+
+
+class RecentSubmissions:
+    """Submission ids accepted recently, so a client retrying after a lost response is not counted twice."""
+
+    def __init__(self, capacity=100000):
+        self._capacity = capacity
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, submission_id):
+        """Returns False if the id was already claimed."""
+        with self._lock:
+            if submission_id in self._ids:
+                return False
+            self._ids[submission_id] = None
+            if len(self._ids) > self._capacity:
+                self._ids.popitem(last=False)
+            return True
+
+    def release(self, submission_id):
+        with self._lock:
+            self._ids.pop(submission_id, None)
+
+
+RECENT_SUBMISSIONS = RecentSubmissions()
+
+
+def instrument_lookup(registry):
+    """Returns a function mapping an instrument id to its compiled instrument (None if unknown).
+
+    The directory is listed once and each instrument fetched once per lookup,
+    so validating a large batch does not stat the files for every line.
+    """
+    available = set(registry.available())
+    instruments = {}
+
+    def lookup(instrument_id):
+        if not isinstance(instrument_id, str) or instrument_id not in available:
+            return None
+        if instrument_id not in instruments:
+            instruments[instrument_id] = registry.get(instrument_id)
+        return instruments[instrument_id]
+    return lookup
+
+
+def parse_result(payload, lookup):
+    """Validates one submitted result; returns (instrument, responses, cohort, submission_id)."""
+    if not isinstance(payload, dict):
+        raise ValueError("expected a JSON object")
+    instrument = lookup(payload.get("instrument"))
+    if instrument is None:
+        raise ValueError(f"unknown instrument {payload.get('instrument')!r}")
+    responses = payload.get("responses")
+    n_choices = instrument.style_matrix.shape[1]
+    if (not isinstance(responses, list) or len(responses) != len(instrument.questions)
+            or not all(type(r) is int and 0 <= r < n_choices for r in responses)):
+        raise ValueError(f"responses must list one choice (0-{n_choices - 1}) for each of the {len(instrument.questions)} questions")
+    cohort = payload.get("cohort") or DEFAULT_COHORT
+    if not isinstance(cohort, str) or len(cohort) > MAX_COHORT_LENGTH:
+        raise ValueError("invalid cohort")
+    submission_id = payload.get("submission_id")
+    if submission_id is not None and (not isinstance(submission_id, str) or len(submission_id) > 100):
+        raise ValueError("invalid submission_id")
+    return instrument, responses, cohort, submission_id
+
+
+def parse_ingest_line(payload, lookup, received):
+    """Validates one NDJSON result; answers may also be letters, and timestamp defaults to received."""
+    if isinstance(payload, dict) and isinstance(payload.get("responses"), list):
+        payload = dict(payload, responses=[
+            LETTER_INDEX.get(r.strip().upper(), r) if isinstance(r, str) else r for r in payload["responses"]
+        ])
+    instrument, responses, cohort, submission_id = parse_result(payload, lookup)
+    timestamp = payload.get("timestamp")
+    if timestamp is None:
+        return instrument, responses, cohort, submission_id, received
+    try:
+        parsed = datetime.fromisoformat(timestamp)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone().replace(tzinfo=None)
+    except (TypeError, ValueError, OverflowError):
+        # OverflowError: an aware timestamp that leaves datetime's range in local time.
+        raise ValueError(f"invalid timestamp {timestamp!r}") from None
+    # Kiosk clocks drift, but a result from before 1970 or from tomorrow is wrong, and the
+    # Parquet and response-log sinks cannot store years before 1000.
+    if not EARLIEST_TIMESTAMP <= parsed <= received + timedelta(days=1):
+        raise ValueError(f"timestamp {timestamp!r} is outside {EARLIEST_TIMESTAMP:%Y-%m-%d} to a day from now")
+    return instrument, responses, cohort, submission_id, parsed
+
+
+def ingest_lines(lines, registry):
+    """Validates and scores a batch, then saves every accepted result in one outbox transaction.
+
+    Results are grouped by instrument and each group is scored in one
+    vectorized pass. Invalid lines are reported and skipped; sqlite3.Error
+    from the outbox propagates with nothing saved.
+    """
+    received = datetime.now()
+    lookup = instrument_lookup(registry)
+    groups = {}
+    rejected, claimed, duplicates = [], [], 0
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            instrument, responses, cohort, submission_id, timestamp = parse_ingest_line(json.loads(line), lookup, received)
+        except RecursionError:
+            rejected.append({"line": line_number, "error": "JSON nested too deeply"})
+            continue
+        except (ValueError, OverflowError) as e:
+            rejected.append({"line": line_number, "error": str(e)})
+            continue
+        if submission_id is not None:
+            if not RECENT_SUBMISSIONS.claim(submission_id):
+                duplicates += 1
+                continue
+            claimed.append(submission_id)
+        group = groups.setdefault(instrument.id, (instrument, [], [], []))
+        group[1].append(responses)
+        group[2].append(cohort)
+        group[3].append(timestamp)
+
+    rows, entries = [], []
+    for instrument, responses, cohorts, timestamps in groups.values():
+        group_rows, group_entries = score_results(instrument, np.array(responses, dtype=np.int8), cohorts, timestamps)
+        rows += group_rows
+        entries += group_entries
+    try:
+        if rows:
+            save_results(get_sheet_writer(), get_cohort_aggregates(), rows, entries)
+    except sqlite3.Error:
+        for submission_id in claimed:
+            RECENT_SUBMISSIONS.release(submission_id)
+        raise
+    return {"accepted": len(rows), "duplicates": duplicates, "rejected": rejected}
+
+
+async def submit_result(request):
+    body = await request.body()
+    if len(body) > MAX_BODY_BYTES:
+        return JSONResponse({"error": "request body too large"}, 413)
+    try:
+        # The page posts text/plain to avoid a CORS preflight, so the body is parsed whatever its content type.
+        instrument, responses, cohort, submission_id = parse_result(json.loads(body), instrument_lookup(get_instrument_registry()))
+    except RecursionError:
+        return JSONResponse({"error": "JSON nested too deeply"}, 400)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, 400)
+    if submission_id is not None and not RECENT_SUBMISSIONS.claim(submission_id):
+        return JSONResponse({"duplicate": True}, 200)
+    try:
+        data = await run_in_threadpool(
+            record_result, get_sheet_writer(), get_cohort_aggregates(), instrument, responses, cohort
+        )
+    except sqlite3.Error as e:
+        if submission_id is not None:
+            RECENT_SUBMISSIONS.release(submission_id)
+        print(f"Error saving submitted result to outbox: {e}")
+        return JSONResponse({"error": "result could not be saved, retry later"}, 503)
+    return JSONResponse({"dominant_style": data["dominant_style"], "scores": data["scores"]}, 201)
+
+
+async def ingest(request):
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_INGEST_BYTES:
+            return JSONResponse({"error": f"batch larger than {MAX_INGEST_BYTES} bytes, split it"}, 413)
+    try:
+        summary = await run_in_threadpool(ingest_lines, body.splitlines(), get_instrument_registry())
+    except sqlite3.Error as e:
+        print(f"Error saving ingested results to outbox: {e}")
+        return JSONResponse({"error": "batch could not be saved, retry later"}, 503)
+    return JSONResponse(summary, 200)
+
+
+@lru_cache(maxsize=64)
+def questionnaire_page(instrument_id, version, submit_url):
+    return render_bundle(get_instrument_registry().get(instrument_id), submit_url)
+
+
+async def questionnaire(request):
+    registry = get_instrument_registry()
+    instrument_id = request.path_params["instrument_id"]
+    if instrument_id not in registry.available():
+        return JSONResponse({"error": f"unknown instrument {instrument_id!r}"}, 404)
+    instrument = registry.get(instrument_id)
+    page = questionnaire_page(instrument.id, instrument.version, str(request.url_for("submit_result")))
+    return HTMLResponse(page, headers={"Cache-Control": "public, max-age=300"})
+
+
+async def health(request):
+    status = await run_in_threadpool(get_result_sink().health)
+    status["pending"] = await run_in_threadpool(get_sheet_writer().pending)
+    return JSONResponse(status, 200 if status["ok"] else 503)
+
+
+def create_app():
+    origins = [origin.strip() for origin in get_setting("api", "allowed_origins", "*").split(",")]
+    return Starlette(
+        routes=[
+            Route("/results", submit_result, methods=["POST"], name="submit_result"),
+            Route("/ingest", ingest, methods=["POST"]),
+            Route("/questionnaire/{instrument_id}", questionnaire, methods=["GET"]),
+            Route("/health", health, methods=["GET"]),
+        ],
+        middleware=[Middleware(CORSMiddleware, allow_origins=origins, allow_methods=["GET", "POST"])],
+    )
+
+
+app = create_app()
@@ -1,9 +1,19 @@
 import streamlit as st
-import plotly.graph_objects as go
-from datetime import datetime
-import pandas as pd
-import time
-import gspread
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import hashlib
+import os
+import sqlite3
+from instruments import DEFAULT_INSTRUMENT
+from metrics import REGISTRY, serve_prometheus, start_json_dump
+from resources import (cached_results_chart, cached_results_svg, create_results_donut_chart,
+                       get_cohort_aggregates, get_instrument_registry, get_result_sink, get_sheet_writer,
+                       prewarm_results_cache, results_breakdown, svg_chart_enabled)
+from scoring import STYLES, score_batch, to_response_array
+from session import WELCOME, SessionSizes, answer_at, answers_to_responses, new_answers, state_size
+from session_store import (PERSISTED_KEYS, VALID_TOKEN, RedisSessionStore, SessionRecord, SessionStoreError,
+                           SQLiteSessionStore, new_token, restore, snapshot)
+from settings import get_setting
+from submissions import DEFAULT_COHORT, build_sheet_row, record_result
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
@@ -14,769 +24,341 @@ st.set_page_config(
 )
 
 # --- CUSTOM CSS FOR ENHANCED & RESPONSIVE UI + HIDE BRANDING ---
-st.markdown("""
-<style>
-    /* --- HIDE STREAMLIT BRANDING --- */
-    /* Hide "Made with Streamlit" footer */
-    .stApp > footer {visibility: hidden;}
-    .stApp > footer:after {
-        content:''; 
-        visibility: visible;
-        display: block;
-        position: relative;
-        background-color: var(--background-color);
-        padding: 5px;
-        top: 2px;
-    }
-    
-    /* Hide GitHub link and fork button */
-    .stApp > header {visibility: hidden;}
-    .stApp > header:after {
-        content:''; 
-        visibility: visible;
-        display: block;
-        position: relative;
-        background-color: var(--background-color);
-        padding: 5px;
-        top: 2px;
-    }
-    
-    /* Hide deploy button */
-    .stDeployButton {visibility: hidden;}
-    
-    /* Hide hamburger menu */
-    .stApp > header .stButton {visibility: hidden;}
-    
-    /* Hide GitHub corner ribbon */
-    .github-corner {display: none !important;}
-    
-    /* Hide any GitHub related elements */
-    [data-testid="stToolbar"] {visibility: hidden;}
-    
-    /* Alternative method to hide footer */
-    footer {visibility: hidden !important;}
-    footer:after {
-        content:''; 
-        visibility: visible;
-        display: block;
-        position: relative;
-        background-color: var(--background-color);
-        padding: 5px;
-        top: 2px;
-    }
-    
-    /* Hide the main menu (hamburger) */
-    #MainMenu {visibility: hidden;}
-    
-    /* Hide header */
-    header {visibility: hidden;}
-    header:after {
-        content:''; 
-        visibility: visible;
-        display: block;
-        position: relative;
-        background-color: var(--background-color);
-        padding: 5px;
-        top: 2px;
-    }
-
-    /* --- THIS IS THE DEFINITIVE FIX FOR DARK/LIGHT MODE & MOBILE VISIBILITY --- */
-
-    /* 1. Define Theme-Aware Variables */
-    :root {
-        --primary-color: #1f77b4;
-        --background-color: #FFFFFF;
-        --secondary-background-color: #f8f9fa;
-        --text-color: #2c3e50;
-        --secondary-text-color: #34495e;
-        --border-color: #e9ecef;
-        --heading-color: #1a1a1a;
-        --strong-text-color: #2c3e50;
-    }
-
-    [data-theme="dark"] {
-        --primary-color: #58a6ff;
-        --background-color: #0E1117;
-        --secondary-background-color: #262730;
-        --text-color: #FAFAFA;
-        --secondary-text-color: #d1d1d1;
-        --border-color: #303339;
-        --heading-color: #FFFFFF;
-        --strong-text-color: #FAFAFA;
-    }
-
-    /* 2. Apply Variables to General Elements */
-    .stApp {
-        background-color: var(--background-color);
-        color: var(--text-color);
-    }
-
-    /* Fix for all headings to be visible in both themes */
-    h1, h2, h3, h4, h5, h6 {
-        color: var(--heading-color) !important;
-        font-weight: 700 !important;
-    }
-
-    /* Specific heading fixes */
-    .main-header {
-        color: var(--primary-color) !important;
-        font-size: 2.2rem !important;
-        text-align: center;
-        margin-bottom: 1rem;
-        font-weight: 700 !important;
-    }
-
-    .score-highlight {
-        color: var(--primary-color) !important;
-        font-size: 1.5rem !important;
-        font-weight: bold !important;
-        text-align: center;
-        margin-bottom: 1rem;
-    }
-
-    .question-title {
-        color: var(--heading-color) !important;
-        font-weight: bold !important;
-        margin-bottom: 2.5rem;
-        font-size: 1.5rem;
-        text-align: left;
-        line-height: 1.4;
-    }
-
-    .question-number {
-        color: var(--secondary-text-color) !important;
-        font-size: 1.3rem;
-        font-weight: 600;
-        text-align: left;
-        margin-bottom: 1rem;
-    }
-
-    /* Fix for tab headers and expander headers */
-    .stTabs [data-baseweb="tab-list"] button {
-        color: var(--heading-color) !important;
-        font-weight: 600 !important;
-    }
-
-    .stTabs [data-baseweb="tab-list"] button[aria-selected="true"] {
-        color: var(--primary-color) !important;
-    }
-
-    .stExpanderHeader {
-        color: var(--heading-color) !important;
-        font-weight: 600 !important;
-    }
-
-    /* Strong text and bold elements */
-    strong, b {
-        color: var(--strong-text-color) !important;
-        font-weight: 700 !important;
-    }
-
-    /* Paragraph text */
-    p {
-        color: var(--text-color) !important;
-    }
-
-    /* Results container specific headings */
-    .results-container h2,
-    .results-container h3,
-    .results-container h4,
-    .results-container h5 {
-        color: var(--heading-color) !important;
-        font-weight: 700 !important;
-    }
-
-    /* Welcome container headings */
-    .welcome-container h1,
-    .welcome-container h2 {
-        color: var(--primary-color) !important;
-        font-weight: 700 !important;
-    }
-
-    .results-container, .welcome-container {
-        background-color: var(--secondary-background-color);
-        border: 1px solid var(--border-color);
-        color: var(--text-color);
-    }
-
-    .nav-buttons {
-        border-top: 1px solid var(--border-color);
-    }
-
-    /* 3. Robust Styling for Radio Button Cards */
-    .stRadio > div {
-        gap: 0.75rem;
-    }
-
-    .stRadio label {
-        display: flex;
-        align-items: center;
-        padding: 0.8rem;
-        border-radius: 8px;
-        border: 2px solid var(--border-color);
-        background-color: var(--background-color);
-        box-shadow: 0 2px 4px rgba(0,0,0,0.04);
-        transition: all 0.2s ease-in-out;
-        cursor: pointer;
-    }
-
-    .stRadio label:hover {
-        border-color: var(--primary-color);
-        background-color: var(--secondary-background-color);
-    }
-
-    /* The actual radio circle input */
-    .stRadio input[type="radio"] {
-        flex-shrink: 0;
-    }
-
-    /* The div containing the text next to the radio button */
-    .stRadio label > div {
-        flex-grow: 1;
-        margin-left: 0.75rem;
-        color: var(--text-color) !important;
-        min-width: 0;
-    }
-
-    /* General Layout Styles */
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(20px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-    
-    .question-container {
-        margin: 2rem auto;
-        max-width: 800px;
-        animation: fadeIn 0.5s ease-in-out;
-        display: flex;
-        flex-direction: column;
-    }
-    
-    .results-container, .welcome-container {
-        padding: 2rem;
-        margin: 2rem auto;
-        border-radius: 15px;
-        max-width: 800px;
-        animation: fadeIn 0.5s ease-in-out;
-        display: flex;
-        flex-direction: column;
-        justify-content: center;
-    }
-    
-    .stButton > button {
-        width: 100%;
-        padding: 1rem;
-        border-radius: 10px;
-        font-weight: 600;
-        transition: all 0.3s ease;
-        border: 2px solid transparent;
-        margin-bottom: 0.5rem;
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-    }
-    
-    .stButton button[kind="primary"] {
-        background-color: var(--primary-color);
-        border-color: var(--primary-color);
-        color: white;
-    }
-    
-    .stButton button[kind="secondary"] {
-        border-color: var(--primary-color);
-        color: var(--primary-color);
-        background-color: transparent;
-    }
-    
-    .keyword-banner {
-        background-color: rgba(31, 119, 180, 0.1);
-        padding: 0.75rem 1rem;
-        border-radius: 8px;
-        margin-bottom: 1.5rem;
-        text-align: center;
-        font-style: italic;
-        border: 1px solid rgba(31, 119, 180, 0.2);
-        color: var(--text-color) !important;
-    }
-    
-    .keyword-banner strong {
-        color: var(--strong-text-color) !important;
-    }
-    
-    .nav-buttons {
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-        margin-top: 3rem;
-        padding-top: 1.5rem;
-    }
-
-    /* List items styling */
-    li {
-        color: var(--text-color) !important;
-        margin-bottom: 0.5rem;
-    }
-
-    /* Responsive Design for Mobile */
-    @media (max-width: 768px) {
-        .main-header {
-            font-size: 1.8rem !important;
-        }
-        
-        .question-container, .results-container, .welcome-container {
-            margin: 1rem auto;
-            padding: 1.5rem;
-        }
-        
-        .question-title {
-            font-size: 1.2rem;
-            margin-bottom: 2rem;
-        }
-        
-        .question-number {
-            font-size: 1.1rem;
-        }
-        
-        .nav-buttons {
-            margin-top: 2rem;
-        }
-        
-        .score-highlight {
-            font-size: 1.3rem !important;
-        }
-    }
-
-    /* Dark mode specific fixes */
-    [data-theme="dark"] .keyword-banner {
-        background-color: rgba(88, 166, 255, 0.1);
-        border: 1px solid rgba(88, 166, 255, 0.2);
-    }
-</style>
-""", unsafe_allow_html=True)
-
-
-
-# --- DATA (Questions, Scoring, Descriptions) ---
-questions = [
-    {
-        'text': 'When talking to a customer…',
-        'choices': [
-            'I maintain eye contact the whole time. (Driver)',
-            'I alternate between looking at the person and looking down. (Amiable)',
-            'I look around the room a good deal of the time. (Analytical)',
-            'I try to maintain eye contact but look away from time to time. (Expressive)'
-        ]
-    },
-    {
-        'text': 'If I have an important decision to make…',
-        'choices': [
-            'I think it through completely before deciding. (Analytical)',
-            'I go with my gut feelings. (Driver)',
-            'I consider the impact it will have on other people before deciding. (Amiable)',
-            'I run it by someone whose opinion I respect before deciding. (Expressive)'
-        ]
-    },
-    {
-        'text': 'My office or work area mostly has…',
-        'choices': [
-            'Family photos and sentimental items displayed. (Amiable)',
-            'Inspirational posters, awards, and art displayed. (Expressive)',
-            'Graphs and charts displayed. (Analytical)',
-            'Calendars and project outlines displayed. (Driver)'
-        ]
-    },
-    {
-        'text': 'If I am having a conflict with a colleague or customer…',
-        'choices': [
-            'I try to help the situation along by focusing on the positive. (Expressive)',
-            'I stay calm and try to understand the cause of the conflict. (Amiable)',
-            'I try to avoid discussing the issue causing the conflict. (Analytical)',
-            'I confront it right away so that it can get resolved as soon as possible. (Driver)'
-        ]
-    },
-    {
-        'text': 'When I talk on the phone at work…',
-        'choices': [
-            'I keep the conversation focused on the purpose of the call. (Driver)',
-            'I will spend a few minutes chatting before getting down to business. (Expressive)',
-            'I am in no hurry to get off the phone and do not mind chatting about personal things, the weather, and so on. (Amiable)',
-            'I try to keep the conversation as brief as possible. (Analytical)'
-        ]
-    },
-    {
-        'text': 'If a colleague is upset…',
-        'choices': [
-            'I ask if I can do anything to help. (Amiable)',
-            'I leave him alone because I do not want to intrude on his privacy. (Analytical)',
-            'I try to cheer him up and help him to see the bright side. (Expressive)',
-            'I feel uncomfortable and hope he gets over it soon. (Driver)'
-        ]
-    },
-    {
-        'text': 'When I attend meetings at work…',
-        'choices': [
-            'I sit back and think about what is being said before offering my opinion. (Analytical)',
-            'I put all my cards on the table so my opinion is well known. (Driver)',
-            'I express my opinion enthusiastically, but listen to other\'s ideas as well. (Expressive)',
-            'I try to support the ideas of the other people in the meeting. (Amiable)'
-        ]
-    },
-    {
-        'text': 'When I make presentation to a group…',
-        'choices': [
-            'I am entertaining and often humorous. (Expressive)',
-            'I am clear and concise. (Analytical)',
-            'I speak relatively quietly. (Amiable)',
-            'I am direct, specific and sometimes loud. (Driver)'
-        ]
-    },
-    {
-        'text': 'When a client is explaining a problem to me…',
-        'choices': [
-            'I try to understand and empathize with how she is feeling. (Amiable)',
-            'I look for the specific facts pertaining to the situation. (Analytical)',
-            'I listen carefully for the main issue so that I can find a solution. (Driver)',
-            'I use my body language and tone of voice to show that I understand. (Expressive)'
-        ]
-    },
-    {
-        'text': 'When I attend training programs or presentations…',
-        'choices': [
-            'I get bored if the person moves too slowly. (Driver)',
-            'I try to be supportive of the speaker, knowing how hard the job is. (Amiable)',
-            'I want it to be entertaining as well as informative. (Expressive)',
-            'I look for the logic behind what the speaker is saying. (Analytical)'
-        ]
-    },
-    {
-        'text': 'When I want to get my point across to customers or co-workers…',
-        'choices': [
-            'I listen to their point of view first and then express my ideas gently. (Amiable)',
-            'I strongly state my opinion so that they know where I stand. (Driver)',
-            'I try to persuade them without being too forceful. (Expressive)',
-            'I explain the thinking and logic behind what I am saying. (Analytical)'
-        ]
-    },
-    {
-        'text': 'When I am late for an appointment or meeting…',
-        'choices': [
-            'I do not panic but call ahead to say that I will be a few minutes late. (Analytical)',
-            'I feel bad about keeping the other person waiting. (Amiable)',
-            'I get very upset and rush to get there as soon as possible. (Driver)',
-            'I sincerely apologize once I arrive. (Expressive)'
-        ]
-    },
-    {
-        'text': 'I set goals and objectives at work that…',
-        'choices': [
-            'I think I can realistically attain. (Analytical)',
-            'I feel are challenging and would be exciting to achieve. (Expressive)',
-            'I need to achieve as part of a bigger objective. (Driver)',
-            'Will make me feel good when I achieve them. (Amiable)'
-        ]
-    },
-    {
-        'text': 'When explaining a problem to a colleague from whom I need help…',
-        'choices': [
-            'I explain the problem in as much detail as possible. (Analytical)',
-            'I sometimes exaggerate to make my point. (Expressive)',
-            'I try to explain how the problem makes me feel. (Amiable)',
-            'I explain how I would like the problem to be solved. (Driver)'
-        ]
-    },
-    {
-        'text': 'If customers or colleagues are late for an appointment with me…',
-        'choices': [
-            'I keep myself busy by making phone calls or working until they arrive. (Expressive)',
-            'I assume they were delayed a bit and do not get upset. (Amiable)',
-            'I call to make sure that I have the correct information. (Analytical)',
-            'I get upset that the person is wasting my time. (Driver)'
-        ]
-    },
-    {
-        'text': 'When I am behind on a project and feel pressure to get it done…',
-        'choices': [
-            'I make a list of everything I need to do, in what order, by when. (Analytical)',
-            'I block out everything else and focus 100% on the work I need to do. (Driver)',
-            'I become anxious and have a hard time focusing on my work. (Amiable)',
-            'I set a date to get the project done by and go for it. (Expressive)'
-        ]
-    },
-    {
-        'text': 'When I feel verbally attacked…',
-        'choices': [
-            'I ask the person to stop. (Driver)',
-            'I feel hurt but usually do not say anything about it to them. (Amiable)',
-            'I ignore their anger and try to focus on the facts of the situation. (Analytical)',
-            'I let them know in strong terms that I do not like their behavior. (Expressive)'
-        ]
-    },
-    {
-        'text': 'When I see someone whom I like and haven\'t seen recently…',
-        'choices': [
-            'I give him a friendly hug. (Amiable)',
-            'Greet but do not shake hands. (Analytical)',
-            'Give a firm and quick handshake. (Driver)',
-            'Give an enthusiastic handshake that lasts a few moments. (Expressive)'
-        ]
-    }
-]
-
-scoring_map = {
-    1: {'a': 'Driver', 'b': 'Amiable', 'c': 'Analytical', 'd': 'Expressive'}, 2: {'a': 'Analytical', 'b': 'Driver', 'c': 'Amiable', 'd': 'Expressive'}, 3: {'a': 'Amiable', 'b': 'Expressive', 'c': 'Analytical', 'd': 'Driver'}, 4: {'a': 'Expressive', 'b': 'Amiable', 'c': 'Analytical', 'd': 'Driver'}, 5: {'a': 'Driver', 'b': 'Expressive', 'c': 'Amiable', 'd': 'Analytical'}, 6: {'a': 'Amiable', 'b': 'Analytical', 'c': 'Expressive', 'd': 'Driver'}, 7: {'a': 'Analytical', 'b': 'Driver', 'c': 'Expressive', 'd': 'Amiable'}, 8: {'a': 'Expressive', 'b': 'Analytical', 'c': 'Amiable', 'd': 'Driver'}, 9: {'a': 'Amiable', 'b': 'Analytical', 'c': 'Driver', 'd': 'Expressive'}, 10: {'a': 'Driver', 'b': 'Amiable', 'c': 'Expressive', 'd': 'Analytical'}, 11: {'a': 'Amiable', 'b': 'Driver', 'c': 'Expressive', 'd': 'Analytical'}, 12: {'a': 'Analytical', 'b': 'Amiable', 'c': 'Driver', 'd': 'Expressive'}, 13: {'a': 'Analytical', 'b': 'Expressive', 'c': 'Driver', 'd': 'Amiable'}, 14: {'a': 'Analytical', 'b': 'Expressive', 'c': 'Amiable', 'd': 'Driver'}, 15: {'a': 'Expressive', 'b': 'Amiable', 'c': 'Analytical', 'd': 'Driver'}, 16: {'a': 'Analytical', 'b': 'Driver', 'c': 'Amiable', 'd': 'Expressive'}, 17: {'a': 'Driver', 'b': 'Amiable', 'c': 'Analytical', 'd': 'Expressive'}, 18: {'a': 'Amiable', 'b': 'Analytical', 'c': 'Driver', 'd': 'Expressive'}
-}
-
-style_descriptions = {
-    'Analytical': {
-        'title': 'Analytical Style',
-        'keywords': ['Serious', 'Well-organized', 'Systematic', 'Logical', 'Factual', 'Reserved'],
-        'behaviors': ['Show little facial expression', 'Have controlled body movement with slow gestures', 'Have little inflection in their voice and may tend toward monotone', 'Use language that is precise and focuses on specific details', 'Often have charts, graphs and statistics displayed in their office'],
-        'dealing_tips': ['Do not speak in a loud or fast-paced voice', 'Be more formal in your speech and manners', 'Present the pros and cons of an idea, as well as options', 'Do not overstate the benefits of something', 'Follow up in writing', 'Be on time and keep it brief', 'Show how your tool has minimum risk']
-    },
-    'Driver': {
-        'title': 'Driver Style',
-        'keywords': ['Decisive', 'Independent', 'Efficient', 'Intense', 'Deliberate', 'Achieving'],
-        'behaviors': ['Make direct eye contact', 'Move quickly and briskly with purpose', 'Speak forcefully and fast-paced', 'Use direct, bottom-line language', 'Have planning calendars and project outlines displayed in their office'],
-        'dealing_tips': ['Make direct eye contact', 'Speak at a fast pace', 'Get down to business quickly', 'Arrive on time', 'Do not linger', 'Use ABC', 'Avoid over explanation', 'Be organized and well prepared', 'Focus on the results to be produced']
-    },
-    'Amiable': {
-        'title': 'Amiable Style',
-        'keywords': ['Cooperative', 'Friendly', 'Supportive', 'Patient', 'Relaxed'],
-        'behaviors': ['Have a friendly facial expression', 'Make frequent eye contact', 'Use non-aggressive, non-dramatic gestures', 'Speak slowly and in soft tones with moderate inflection', 'Use language that is supportive and encouraging', 'Display lots of family pictures in their office'],
-        'dealing_tips': ['Make eye contact but look away once in a while', 'Speak at a moderate pace and with a softer voice', 'Do not use harsh tone of voice or language', 'Ask them for their opinions and ideas', 'Do not try to counter their ideas with logic alone', 'Encourage them to express any doubts or concerns they may have', 'Avoid pressurizing them to make a decision', 'Mutually agree on all goals, action plans and completion dates']
-    },
-    'Expressive': {
-        'title': 'Expressive Style',
-        'keywords': ['Outgoing', 'Enthusiastic', 'Persuasive', 'Humorous', 'Gregarious', 'Lively'],
-        'behaviors': ['Use rapid hand and arm gestures', 'Speak quickly with lots of animation and inflection', 'Have a wide range of facial expressions', 'Use language that is persuasive', 'Have a workspace cluttered with inspirational items'],
-        'dealing_tips': ['Make direct eye contact', 'Have energetic and fast-paced speech', 'Allow time in a meeting for socializing', 'Talk about experiences, people, and opinions as well as the facts', 'Ask about their intuitive sense of things', 'Support your ideas with testimonials from people whom they know and like', 'Paraphrase any agreements made', 'Maintain a balance between fun and reaching objectives']
-    }
-}
+THEME_STYLESHEET = "theme.css"
+
+@st.cache_resource
+def load_theme_stylesheet():
+    """Reads static/theme.css once per process and returns its text and a short content hash."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", THEME_STYLESHEET)
+    with open(path, encoding="utf-8") as f:
+        css = f.read()
+    return css, hashlib.sha256(css.encode("utf-8")).hexdigest()[:12]
+
+def inject_theme():
+    """Links the stylesheet from Streamlit's static file serving, or inlines it when that is off."""
+    css, digest = load_theme_stylesheet()
+    if st.get_option("server.enableStaticServing"):
+        st.markdown(f'<link rel="stylesheet" href="app/static/{THEME_STYLESHEET}?v={digest}">', unsafe_allow_html=True)
+    else:
+        st.markdown(f"<style>\n{css}</style>", unsafe_allow_html=True)
 
-# --- HELPER FUNCTIONS ---
+inject_theme()
 
-@st.cache_data
-def clean_question_choices(question_list):
-    """Removes the bracketed text from question choices in-place."""
-    # This function now runs only once thanks to caching
-    for question in question_list:
-        cleaned_choices = []
-        for choice in question['choices']:
-            open_paren_index = choice.find(' (')
-            if open_paren_index != -1:
-                cleaned_choices.append(choice[:open_paren_index].strip())
-            else:
-                cleaned_choices.append(choice)
-        question['choices'] = cleaned_choices
-    return question_list
-
-questions = clean_question_choices(questions)
-
-def calculate_scores(responses):
-    scores = {'Driver': 0, 'Analytical': 0, 'Amiable': 0, 'Expressive': 0}
-    for i, response_index in enumerate(responses):
-        if response_index is not None:
-            q_num = i + 1
-            choice = chr(97 + response_index)
-            style = scoring_map[q_num][choice]
-            scores[style] += 1
-    return scores
-
-def create_results_donut_chart(scores):
-    colors = {'Driver': '#FF6B6B', 'Analytical': '#4ECDC4', 'Amiable': '#45B7D1', 'Expressive': '#FFA07A'}
-    fig = go.Figure(data=[go.Pie(
-        labels=list(scores.keys()),
-        values=list(scores.values()),
-        hole=.4,
-        marker_colors=[colors[s] for s in scores.keys()],
-        texttemplate="%{label}<br>%{percent:.1%}",
-        hoverinfo="label+percent+value",
-        textfont_size=14,
-        pull=[0.05 if scores[s] == max(scores.values()) else 0 for s in scores.keys()]
-    )])
-    fig.update_layout(
-        title={'text': 'Your Personality Style Profile', 'y':0.95, 'x':0.5, 'xanchor': 'center', 'yanchor': 'top', 'font': {'size': 24, 'color': 'var(--primary-color)'}},
-        font=dict(size=14, color='var(--text-color)'), 
-        paper_bgcolor='rgba(0,0,0,0)', 
-        showlegend=False,
-        height=450, 
-        margin=dict(l=20, r=20, t=80, b=20)
-    )
-    return fig
+# --- DATA (instruments are defined in instruments/*.json and loaded by instruments.py) ---
+
+# --- HELPER FUNCTIONS ---
 
-def update_google_sheet(data):
-    """Connects to Google Sheets and appends a new row of data."""
+def calculate_scores(responses, style_matrix):
+    counts, _ = score_batch(to_response_array([responses]), style_matrix)
+    return dict(zip(STYLES, counts[0].tolist()))
+
+def current_instrument():
+    """The session's instrument, picked from the ?instrument= link parameter when the session starts."""
+    registry = get_instrument_registry()
+    if 'instrument' not in st.session_state:
+        requested = st.query_params.get("instrument", DEFAULT_INSTRUMENT)
+        st.session_state.instrument = requested if requested in registry.available() else DEFAULT_INSTRUMENT
+    return registry.get(st.session_state.instrument)
+
+@st.cache_resource
+def get_session_sizes():
+    """Process-wide gauge of per-session state size."""
+    return SessionSizes()
+
+@st.cache_resource
+def start_metrics_exporters():
+    """Starts the optional Prometheus listener and JSON dump once per process."""
+    REGISTRY.gauge("active_sessions", lambda: get_session_sizes().summary()["sessions"])
+    port = get_setting("metrics", "port")
+    if port:
+        try:
+            serve_prometheus(int(port))
+        except OSError as e:
+            # E.g. another process on the host holds the port; the app runs without the exporter.
+            print(f"Error starting the Prometheus exporter on port {port}: {e}")
+    json_path = get_setting("metrics", "json_path")
+    if json_path:
+        start_json_dump(json_path, get_setting("metrics", "json_interval", 60.0))
+
+@st.cache_resource
+def get_session_store():
+    """Process-wide session store chosen by [sessions] store (sqlite or redis); None keeps sessions in process."""
+    kind = get_setting("sessions", "store")
+    ttl = get_setting("sessions", "ttl", 7 * 24 * 3600)
+    if not kind:
+        return None
+    if kind == "sqlite":
+        return SQLiteSessionStore(get_setting("sessions", "path", "results_sessions.db"), ttl)
+    if kind == "redis":
+        return RedisSessionStore(get_setting("sessions", "url", "redis://localhost:6379/0"), ttl)
+    raise ValueError(f"unknown [sessions] store {kind!r}")
+
+def load_session():
+    """Adopts the stored progress for the ?session= token when another replica has saved a newer version.
+
+    A fresh visit gets a new token, added to the link so reloading or
+    reconnecting to any replica resumes the assessment.
+    """
+    store = get_session_store()
+    if store is None:
+        return
+    token = st.query_params.get("session")
+    if not token or not VALID_TOKEN.match(token):
+        token = new_token()
+        st.query_params["session"] = token
+    if st.session_state.get("session_token") != token:
+        for key in PERSISTED_KEYS:
+            st.session_state.pop(key, None)
+        st.session_state.session_token = token
+        st.session_state.session_version = 0
+        st.session_state.session_snapshot = None
     try:
-        gc = gspread.service_account_from_dict(st.secrets["gcp_service_account"])
-        spreadsheet = gc.open("Personality Assessment Results")
-        worksheet = spreadsheet.worksheet("Sheet1")
-        
-        row_to_insert = [
-            data.get("timestamp"),
-            data.get("dominant_style"),
-            data.get("scores", {}).get("Driver"),
-            data.get("scores", {}).get("Analytical"),
-            data.get("scores", {}).get("Amiable"),
-            data.get("scores", {}).get("Expressive"),
-        ] + data.get("responses", [None]*18)
-        
-        worksheet.append_row(row_to_insert)
-    except Exception as e:
-        print(f"Error updating Google Sheet: {e}")
+        record = store.load(token)
+    except (OSError, sqlite3.Error, SessionStoreError) as e:
+        REGISTRY.inc("session_store_errors_total", op="load")
+        print(f"Error loading session {token}: {e}")
+        return
+    if record is not None and record.version > st.session_state.session_version:
+        restore(st.session_state, record.state)
+        st.session_state.session_version = record.version
+        st.session_state.session_snapshot = record.state
+
+def save_session():
+    """Writes the persisted keys back to the session store if this run changed them."""
+    store = get_session_store()
+    if store is None or "session_token" not in st.session_state:
+        return
+    state = snapshot(st.session_state)
+    if state == st.session_state.session_snapshot:
+        return
+    record = SessionRecord(st.session_state.session_version + 1, state)
+    try:
+        store.save(st.session_state.session_token, record)
+    except (OSError, sqlite3.Error, SessionStoreError) as e:
+        REGISTRY.inc("session_store_errors_total", op="save")
+        print(f"Error saving session {st.session_state.session_token}: {e}")
+        return
+    st.session_state.session_version = record.version
+    st.session_state.session_snapshot = state
+
+def record_session_size():
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        get_session_sizes().record(ctx.session_id, state_size(st.session_state.to_dict()))
+
+def current_cohort():
+    """Cohort named by the ?cohort= link parameter."""
+    return st.query_params.get("cohort", DEFAULT_COHORT)
 
 # --- UI DISPLAY FUNCTIONS ---
-def display_welcome():
+@REGISTRY.timed("page_render_seconds", page="welcome")
+def display_welcome(instrument):
     st.markdown('<div class="welcome-container">', unsafe_allow_html=True)
-    st.markdown('<h1 class="main-header">Welcome to the Personality Style Assessment</h1>', unsafe_allow_html=True)
-    st.markdown("""
+    st.markdown(f'<h1 class="main-header">Welcome to the {instrument.title}</h1>', unsafe_allow_html=True)
+    st.markdown(f"""
     <p style="text-align: center; font-size: 1.2rem;">
         Discover your dominant behavioral style and learn how to effectively interact with others.
     </p>
     <p style="text-align: center; color: var(--secondary-text-color);">
-        This assessment consists of 18 questions. For each question, simply select the option that best describes you. 
+        This assessment consists of {len(instrument.questions)} questions. For each question, simply select the option that best describes you. 
         The next question will appear automatically.
     </p>
     """, unsafe_allow_html=True)
     st.markdown("---")
     _, col2, _ = st.columns([1, 1, 1])
     if col2.button("Start Assessment", type="primary", use_container_width=True):
-        st.session_state.started = True
-        st.session_state.current_question = 0
+        st.session_state.cursor = 0
         st.rerun()
     st.markdown('</div>', unsafe_allow_html=True)
 
-def display_single_question():
-    current_q = st.session_state.current_question
+def answer_question(question_index):
+    # The answer byte is the source of truth, so the radio's own key is dropped once answered.
+    st.session_state.answers[question_index] = st.session_state.pop(f"q_{question_index}_radio")
+    st.session_state.cursor = question_index + 1
+
+def go_to_question(question_index):
+    st.session_state.cursor = question_index
+
+@st.fragment
+@REGISTRY.timed("page_render_seconds", page="question")
+def display_single_question(instrument):
+    # Answers rerun only this fragment; the last one needs a full rerun to leave the questionnaire.
+    questions = instrument.questions
+    current_q = st.session_state.cursor
     total_questions = len(questions)
+    if current_q >= total_questions:
+        st.rerun()
     
-    st.markdown('<div class="question-container">', unsafe_allow_html=True)
-    
-    st.markdown(f'<div class="question-number">Question {current_q + 1} of {total_questions}</div>', unsafe_allow_html=True)
-    st.markdown(f'<div class="question-title">{questions[current_q]["text"]}</div>', unsafe_allow_html=True)
-    
-    radio_key = f"q_{current_q}_radio"
-    
-    selected = st.radio(
-        "Select your answer:",
-        options=range(len(questions[current_q]['choices'])),
-        format_func=lambda x: questions[current_q]['choices'][x],
-        key=radio_key,
-        index=st.session_state.responses[current_q],
-        label_visibility="collapsed"
-    )
-    
-    if selected is not None and selected != st.session_state.responses[current_q]:
-        st.session_state.responses[current_q] = selected
-        if current_q < total_questions - 1:
-            time.sleep(0.25)
-            st.session_state.current_question += 1
-            st.rerun()
-        else:
-            st.session_state.show_results = True
-            st.rerun()
-    
-    st.markdown('<div class="nav-buttons">', unsafe_allow_html=True)
-    col1, col2, col3 = st.columns([1, 2, 1])
-    
-    with col1:
-        if current_q > 0:
-            if st.button("Back", use_container_width=True):
-                st.session_state.current_question -= 1
-                st.rerun()
-    
-    with col2:
-        st.progress((current_q) / total_questions)
-    
-    with col3:
-        if current_q < total_questions - 1 and st.session_state.responses[current_q] is not None:
-            if st.button("Next", use_container_width=True):
-                st.session_state.current_question += 1
-                st.rerun()
-    
-    st.markdown('</div>', unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
+    with st.container(key=f"question_{current_q}"):
+        st.markdown('<div class="question-container">', unsafe_allow_html=True)
+        
+        st.markdown(f'<div class="question-number">Question {current_q + 1} of {total_questions}</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="question-title">{questions[current_q].text}</div>', unsafe_allow_html=True)
+        
+        st.radio(
+            "Select your answer:",
+            options=range(len(questions[current_q].choices)),
+            format_func=lambda x: questions[current_q].choices[x].text,
+            key=f"q_{current_q}_radio",
+            index=answer_at(st.session_state.answers, current_q),
+            on_change=answer_question,
+            args=(current_q,),
+            label_visibility="collapsed"
+        )
+        
+        st.markdown('<div class="nav-buttons">', unsafe_allow_html=True)
+        col1, col2, col3 = st.columns([1, 2, 1])
+        
+        with col1:
+            if current_q > 0:
+                st.button("Back", on_click=go_to_question, args=(current_q - 1,), use_container_width=True)
+        
+        with col2:
+            st.progress((current_q) / total_questions)
+        
+        with col3:
+            if current_q < total_questions - 1 and answer_at(st.session_state.answers, current_q) is not None:
+                st.button("Next", on_click=go_to_question, args=(current_q + 1,), use_container_width=True)
+        
+        st.markdown('</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+    # Answering reruns only this fragment, so progress is saved here as well as at the end of main().
+    save_session()
 
-def display_results():
+@REGISTRY.timed("page_render_seconds", page="results")
+def display_results(instrument):
     st.markdown('<div class="results-container">', unsafe_allow_html=True)
-    scores = calculate_scores(st.session_state.responses)
+    responses = answers_to_responses(st.session_state.answers)
+    scores = calculate_scores(responses, instrument.style_matrix)
     max_score = max(scores.values()) if scores else 0
     dominant_styles = [s for s, score in scores.items() if score == max_score]
 
     if 'data_saved' not in st.session_state or not st.session_state.data_saved:
-        letter_responses = [chr(65 + r) if r is not None else None for r in st.session_state.responses]
-        total_questions = len(questions)
-        percentage_scores = {style: f"{(score / total_questions) * 100:.1f}%" for style, score in scores.items()}
-        data_to_save = {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "dominant_style": " & ".join(dominant_styles),
-            "scores": percentage_scores,
-            "responses": letter_responses
-        }
-        update_google_sheet(data_to_save)
-        st.session_state.data_saved = True
+        try:
+            record_result(get_sheet_writer(), get_cohort_aggregates(), instrument, responses, current_cohort())
+            st.session_state.data_saved = True
+        except sqlite3.Error as e:
+            print(f"Error saving results to outbox: {e}")
 
     st.markdown('<h2 style="text-align: center; color: var(--primary-color);">Your Assessment Results</h2>', unsafe_allow_html=True)
-    st.plotly_chart(create_results_donut_chart(scores), use_container_width=True)
+    if svg_chart_enabled():
+        st.markdown(cached_results_svg(tuple(scores.items())), unsafe_allow_html=True)
+    else:
+        st.plotly_chart(cached_results_chart(tuple(scores.items())), use_container_width=True)
     st.markdown("---")
 
+    breakdown = results_breakdown((instrument.id, instrument.version), tuple(dominant_styles), instrument)
+    st.markdown(breakdown["headline"], unsafe_allow_html=True)
     if len(dominant_styles) == 1:
-        style = dominant_styles[0]
-        info = style_descriptions[style]
-        st.markdown(f'<div class="score-highlight">Your Dominant Style is {info["title"]}</div>', unsafe_allow_html=True)
-        
+        section = breakdown["sections"][0]
         with st.expander("Click here for a detailed breakdown of your style", expanded=True):
-            st.markdown(f'<div class="keyword-banner"><strong>Keywords:</strong> {", ".join(info["keywords"])}</div>', unsafe_allow_html=True)
+            st.markdown(section["keywords"], unsafe_allow_html=True)
             
             tab1, tab2 = st.tabs(["Key Behaviors", "Tips for Interaction"])
             with tab1:
-                for behavior in info['behaviors']:
-                    st.markdown(f"• {behavior}")
+                st.markdown(section["behaviors"])
             with tab2:
-                for tip in info['dealing_tips']:
-                    st.markdown(f"• {tip}")
+                st.markdown(section["tips"])
     else:
-        st.markdown('<div class="score-highlight">You have a blend of styles!</div>', unsafe_allow_html=True)
         st.markdown(f"<p style='text-align:center;'>Your dominant styles are: {' & '.join(dominant_styles)}</p>", unsafe_allow_html=True)
         
-        tabs = st.tabs([style_descriptions[s]['title'] for s in dominant_styles])
-        for i, style in enumerate(dominant_styles):
-            with tabs[i]:
-                info = style_descriptions[style]
-                st.markdown(f'<div class="keyword-banner"><strong>Keywords:</strong> {", ".join(info["keywords"])}</div>', unsafe_allow_html=True)
+        tabs = st.tabs([section["title"] for section in breakdown["sections"]])
+        for tab, section in zip(tabs, breakdown["sections"]):
+            with tab:
+                st.markdown(section["keywords"], unsafe_allow_html=True)
                 
                 col1, col2 = st.columns(2)
                 with col1:
                     st.markdown("##### Key Behaviors")
-                    for behavior in info['behaviors']:
-                        st.markdown(f"• {behavior}")
+                    st.markdown(section["behaviors"])
                 with col2:
                     st.markdown("##### Tips for Interaction")
-                    for tip in info['dealing_tips']:
-                        st.markdown(f"• {tip}")
+                    st.markdown(section["tips"])
 
     st.markdown("---")
     st.markdown('<p style="text-align:center; color: var(--secondary-text-color);">Thank you for completing the assessment.</p>', unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
+@REGISTRY.timed("page_render_seconds", page="admin")
+def display_dashboard():
+    password = get_setting("admin", "password")
+    if not password:
+        st.error("The facilitator dashboard is disabled. Set [admin] password to enable it.")
+        return
+    if st.session_state.get("admin_password") != password:
+        st.text_input("Facilitator password", type="password", key="admin_password")
+        return
+
+    aggregates = get_cohort_aggregates()
+    st.markdown('<h1 class="main-header">Cohort Dashboard</h1>', unsafe_allow_html=True)
+    cohorts = aggregates.cohorts()
+    if not cohorts:
+        st.info("No results have been recorded yet.")
+        return
+    default = st.query_params.get("cohort", DEFAULT_COHORT)
+    cohort = st.selectbox("Cohort", cohorts, index=cohorts.index(default) if default in cohorts else 0)
+    if st.button("Refresh"):
+        st.rerun()
+
+    cohort_snapshot = aggregates.snapshot(cohort)
+    st.metric("Completed assessments", cohort_snapshot["total"])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("##### Dominant Styles")
+        st.bar_chart(cohort_snapshot["dominant"])
+    with col2:
+        st.markdown("##### Average Percentage per Style")
+        st.bar_chart(cohort_snapshot["average_percentages"])
+
+    sizes = get_session_sizes().summary()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Active sessions (this process)", sizes["sessions"])
+    col2.metric("Mean session state", f"{sizes['mean_bytes'] / 1024:.1f} KiB")
+    col3.metric("Largest session state", f"{sizes['max_bytes'] / 1024:.1f} KiB")
+
+    health = get_result_sink().health()
+    status = f"Storage sink `{health['sink']}`: {'healthy' if health['ok'] else 'unavailable'}"
+    status += f" ({health['detail']})" if health["detail"] else ""
+    status += f", {get_sheet_writer().pending()} rows awaiting delivery"
+    dead = get_sheet_writer().dead()
+    status += f", {dead} rows dead-lettered (see `python outbox.py`)" if dead else ""
+    (st.caption if health["ok"] else st.warning)(status)
+
+    st.markdown("##### Choices per Question")
+    st.dataframe(
+        [{"Question": q + 1, **{chr(65 + c): n for c, n in enumerate(counts)}} for q, counts in enumerate(cohort_snapshot["choices"])],
+        hide_index=True,
+        use_container_width=True,
+    )
+
 # --- MAIN APP LOGIC ---
 def main():
-    if 'started' not in st.session_state:
-        st.session_state.started = False
-    if 'current_question' not in st.session_state:
-        st.session_state.current_question = 0
-    if 'responses' not in st.session_state:
-        st.session_state.responses = [None] * len(questions)
-    if 'show_results' not in st.session_state:
-        st.session_state.show_results = False
-
-    if not st.session_state.started:
-        display_welcome()
-    elif not st.session_state.show_results:
-        display_single_question()
+    start_metrics_exporters()
+    if get_setting("results", "prewarm", False):
+        prewarm_results_cache()
+    if st.query_params.get("page") == "admin":
+        display_dashboard()
+        return
+
+    load_session()
+    instrument = current_instrument()
+    n_questions = len(instrument.questions)
+    # cursor is WELCOME, the index of the current question, or the question count for the results page.
+    if 'answers' not in st.session_state or len(st.session_state.answers) != n_questions:
+        # Also restarts sessions whose instrument was edited to a different length mid-assessment.
+        st.session_state.cursor = WELCOME
+        st.session_state.answers = new_answers(n_questions)
+
+    if st.session_state.cursor == WELCOME:
+        display_welcome(instrument)
+    elif st.session_state.cursor < n_questions:
+        display_single_question(instrument)
     else:
-        display_results()
+        display_results(instrument)
+
+    save_session()
+    record_session_size()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,241 @@
+"""Micro-benchmarks for the scoring, rendering and submission hot paths.
+
+Each benchmark reports operations per second (best of several rounds) and
+the bytes allocated by a single operation. Results are compared against
+benchmarks/baseline.json and the run fails when a benchmark is slower than
+its baseline by more than the tolerance:
+
+    python benchmarks/bench.py                  # compare against the baseline
+    python benchmarks/bench.py --save           # record a new baseline
+    python benchmarks/bench.py -k scores -k chart
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+sys.path.insert(0, ROOT)
+
+# Keep the app's local stores out of the working tree while benchmarking.
+_scratch = tempfile.mkdtemp(prefix="pa-bench-")
+os.environ.setdefault("PA_OUTBOX_PATH", os.path.join(_scratch, "outbox.db"))
+os.environ.setdefault("PA_AGGREGATES_PATH", os.path.join(_scratch, "aggregates.db"))
+
+BENCHMARKS = {}
+
+SAMPLE_RESPONSES = [0, 1, 3, 0, 2, 2, 0, 1, 3, 0, 2, 0, 2, 3, 2, 1, 0, 3]
+
+
+def benchmark(name):
+    """Registers a setup function that returns the zero-argument operation to time."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+SAMPLE_ROW = ["2025-01-01 09:00:00", "Driver", "33.3%", "22.2%", "22.2%", "22.2%"] + [chr(65 + r) for r in SAMPLE_RESPONSES]
+
+
+def load_app():
+    import app
+    return app
+
+
+@benchmark("calculate_scores")
+def bench_calculate_scores():
+    from instruments import DEFAULT_INSTRUMENT, InstrumentRegistry
+    app = load_app()
+    style_matrix = InstrumentRegistry().get(DEFAULT_INSTRUMENT).style_matrix
+    return lambda: app.calculate_scores(SAMPLE_RESPONSES, style_matrix)
+
+
+@benchmark("load_instrument")
+def bench_load_instrument():
+    from instruments import DEFAULT_INSTRUMENT, INSTRUMENTS_DIR, load_instrument
+    path = os.path.join(INSTRUMENTS_DIR, f"{DEFAULT_INSTRUMENT}.json")
+    return lambda: load_instrument(path)
+
+
+@benchmark("instrument_registry_get")
+def bench_instrument_registry_get():
+    from instruments import DEFAULT_INSTRUMENT, InstrumentRegistry
+    registry = InstrumentRegistry()
+    return lambda: registry.get(DEFAULT_INSTRUMENT)
+
+
+@benchmark("create_results_donut_chart")
+def bench_create_results_donut_chart():
+    from instruments import DEFAULT_INSTRUMENT, InstrumentRegistry
+    app = load_app()
+    scores = app.calculate_scores(SAMPLE_RESPONSES, InstrumentRegistry().get(DEFAULT_INSTRUMENT).style_matrix)
+    return lambda: app.create_results_donut_chart(scores)
+
+
+@benchmark("donut_svg")
+def bench_donut_svg():
+    from charts import donut_svg
+    from instruments import DEFAULT_INSTRUMENT, InstrumentRegistry
+    app = load_app()
+    scores = app.calculate_scores(SAMPLE_RESPONSES, InstrumentRegistry().get(DEFAULT_INSTRUMENT).style_matrix)
+    return lambda: donut_svg(scores)
+
+
+@benchmark("build_sheet_row")
+def bench_build_sheet_row():
+    app = load_app()
+    data = {
+        "timestamp": "2025-01-01 09:00:00",
+        "dominant_style": "Driver",
+        "scores": {"Driver": "33.3%", "Analytical": "22.2%", "Amiable": "22.2%", "Expressive": "22.2%"},
+        "responses": [chr(65 + r) for r in SAMPLE_RESPONSES],
+    }
+    return lambda: app.build_sheet_row(data)
+
+
+@benchmark("sheet_writer_enqueue")
+def bench_sheet_writer_enqueue():
+    from fake_sheets import FakeSheetsConnection
+    from outbox import Outbox, SheetWriter
+    from sheets import SheetsSink
+    outbox = Outbox(os.path.join(_scratch, "bench_outbox.db"))
+    sink = SheetsSink(FakeSheetsConnection(latency=0, writes_per_minute=0))
+    writer = SheetWriter(sink, outbox, writes_per_minute=6000, flush_timeout=1.0)
+    return lambda: writer.enqueue(SAMPLE_ROW)
+
+
+@benchmark("sqlite_sink_append_100")
+def bench_sqlite_sink_append():
+    from sinks import SQLiteSink
+    sink = SQLiteSink(os.path.join(_scratch, "bench_results.db"))
+    rows = [SAMPLE_ROW] * 100
+    return lambda: sink.append_many(rows)
+
+
+@benchmark("parquet_sink_append_100")
+def bench_parquet_sink_append():
+    from results_store import ParquetSink
+    sink = ParquetSink(os.path.join(_scratch, "bench_parquet"))
+    rows = [SAMPLE_ROW] * 100
+    return lambda: sink.append_many(rows)
+
+
+@benchmark("csv_sink_append_100")
+def bench_csv_sink_append():
+    from sinks import CSVSink
+    sink = CSVSink(os.path.join(_scratch, "bench_results.csv"))
+    rows = [SAMPLE_ROW] * 100
+    return lambda: sink.append_many(rows)
+
+
+@benchmark("item_stats_update_10000")
+def bench_item_stats_update():
+    import numpy as np
+    from instruments import DEFAULT_INSTRUMENT, InstrumentRegistry
+    from item_stats import ItemStats
+    style_matrix = InstrumentRegistry().get(DEFAULT_INSTRUMENT).style_matrix
+    responses = np.random.default_rng(0).integers(0, 4, size=(10000, len(SAMPLE_RESPONSES))).astype(np.int8)
+    stats = ItemStats(style_matrix)
+    return lambda: stats.update(responses)
+
+
+@benchmark("response_log_scan_100000")
+def bench_response_log_scan():
+    import numpy as np
+    from instruments import DEFAULT_INSTRUMENT, InstrumentRegistry
+    from response_log import ResponseLogSink, append_records, open_log, pack, scan
+    style_matrix = InstrumentRegistry().get(DEFAULT_INSTRUMENT).style_matrix
+    path = ResponseLogSink(os.path.join(_scratch, "bench_log")).path(DEFAULT_INSTRUMENT)
+    responses = np.random.default_rng(0).integers(0, 4, size=(100000, len(SAMPLE_RESPONSES))).astype(np.int8)
+    append_records(path, pack(responses, np.zeros(len(responses), dtype="datetime64[s]")))
+    records = open_log(path)
+    return lambda: sum(len(counts) for _, _, counts, _ in scan(records, style_matrix))
+
+
+@benchmark("full_session")
+def bench_full_session():
+    from streamlit.testing.v1 import AppTest
+
+    def run():
+        at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60).run()
+        at.button[0].click().run()
+        for choice in SAMPLE_RESPONSES:
+            at.radio[0].set_value(choice).run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return run
+
+
+def measure(op, rounds=5, min_time=0.2):
+    """Returns the best ops/sec over several rounds and the bytes one call allocates."""
+    op()
+    best = 0.0
+    for _ in range(rounds):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            op()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = max(best, calls / elapsed)
+
+    tracemalloc.start()
+    try:
+        op()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"ops_per_sec": best, "peak_alloc_bytes": peak}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", dest="selected", action="append", help="only run benchmarks whose name contains this")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown as a fraction (default: 0.25)")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE)
+    args = parser.parse_args(argv)
+
+    names = [n for n in BENCHMARKS if not args.selected or any(k in n for k in args.selected)]
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<28}{'ops/sec':>14}{'baseline':>14}{'change':>9}{'peak alloc':>14}")
+    for name in names:
+        result = results[name] = measure(BENCHMARKS[name](), rounds=args.rounds)
+        reference = baseline.get(name)
+        change = ""
+        if reference:
+            ratio = result["ops_per_sec"] / reference["ops_per_sec"]
+            change = f"{ratio - 1:+.0%}"
+            if ratio < 1 - args.tolerance:
+                regressions.append(name)
+        reference_ops = f"{reference['ops_per_sec']:,.1f}" if reference else "-"
+        print(f"{name:<28}{result['ops_per_sec']:>14,.1f}{reference_ops:>14}{change:>9}{result['peak_alloc_bytes']:>14,}")
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}")
+    elif regressions:
+        print(f"Regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
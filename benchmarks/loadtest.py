@@ -0,0 +1,288 @@
+"""Load test: concurrent simulated respondents against one local instance of the app.
+
+Starts `streamlit run app.py` with results going to the fake Sheets sink (see
+fake_sheets.py) and scratch outbox and aggregate stores, then drives each
+respondent over the app's websocket like a browser would: load the page,
+click Start, answer every question and wait for the results page. Reports
+completed sessions per second, latency per click (from sending the click to
+the end of the rerun it triggers) as p50/p90/p99, and the server's CPU time
+per session and resident memory per concurrent session:
+
+    python benchmarks/loadtest.py --sessions 100 --concurrency 20
+    python benchmarks/loadtest.py --sessions 500 --concurrency 100 --think-time 2 --sink-latency 0.5
+    python benchmarks/loadtest.py --url ws://10.0.0.5:8501 --sessions 50   # an already running server
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# ScriptFinishedStatus values that end the rerun a click triggered; FINISHED_EARLY_FOR_RERUN (2) does not.
+FINISHED = {0, 3}
+RESULTS_MARKER = "Your Assessment Results"
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+class Page:
+    """The widgets and text a rerun rendered."""
+
+    def __init__(self):
+        self.widgets = {}
+        self.text = []
+        self.errors = []
+
+    def add(self, delta):
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element = delta.new_element
+        kind = element.WhichOneof("type")
+        value = getattr(element, kind)
+        if kind == "exception":
+            self.errors.append(f"{value.type}: {value.message}")
+        elif kind == "markdown":
+            self.text.append(value.body)
+        elif getattr(value, "id", ""):
+            self.widgets[(kind, getattr(value, "label", ""))] = (value.id, delta.fragment_id)
+
+    def widget(self, kind, label=None):
+        for (widget_kind, widget_label), widget in self.widgets.items():
+            if widget_kind == kind and (label is None or widget_label == label):
+                return widget
+        return None
+
+
+class Respondent:
+    """One simulated browser tab on the app's websocket."""
+
+    def __init__(self, ws, query_string, timeout):
+        self.ws = ws
+        self.query_string = query_string
+        self.timeout = timeout
+
+    async def rerun(self, widget=None, fragment_id=""):
+        """Sends one rerun request and returns the Page it renders."""
+        msg = BackMsg()
+        msg.rerun_script.query_string = self.query_string
+        msg.rerun_script.fragment_id = fragment_id
+        if widget is not None:
+            msg.rerun_script.widget_states.widgets.append(widget)
+        await self.ws.send(msg.SerializeToString())
+        page = Page()
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await asyncio.wait_for(self.ws.recv(), self.timeout))
+            kind = forward.WhichOneof("type")
+            if kind == "delta":
+                page.add(forward.delta)
+            elif kind == "script_finished" and forward.script_finished in FINISHED:
+                return page
+
+
+async def run_session(url, query_string, think_time, timeout, rng, latencies):
+    """Completes one assessment; records (click kind, seconds) latencies and returns True on success."""
+    async with websockets.connect(f"{url}/_stcore/stream", subprotocols=["streamlit"], max_size=None) as ws:
+        respondent = Respondent(ws, query_string, timeout)
+
+        async def click(kind, widget=None, fragment_id=""):
+            if think_time and kind != "load":
+                await asyncio.sleep(rng.uniform(0.5, 1.5) * think_time)
+            started = time.perf_counter()
+            page = await respondent.rerun(widget, fragment_id)
+            if kind == "answer" and page.widget("radio") is None:
+                # The last answer leaves the questionnaire: a full rerun that scores, saves and charts the result.
+                kind = "finish"
+            latencies[kind].append(time.perf_counter() - started)
+            if page.errors:
+                raise RuntimeError(page.errors[0])
+            return page
+
+        page = await click("load")
+        start = page.widget("button", "Start Assessment")
+        if start is None:
+            raise RuntimeError("no Start Assessment button on the welcome page")
+        page = await click("start", WidgetState(id=start[0], trigger_value=True))
+        while (radio := page.widget("radio")) is not None:
+            widget_id, fragment_id = radio
+            page = await click("answer", WidgetState(id=widget_id, int_value=rng.randrange(4)), fragment_id)
+        return any(RESULTS_MARKER in text for text in page.text)
+
+
+class ProcessMonitor:
+    """Samples a process's CPU time and resident memory from /proc."""
+
+    def __init__(self, pid, interval=0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+
+    def cpu_seconds(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+    def rss(self):
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    async def sample(self):
+        while True:
+            self.peak_rss = max(self.peak_rss, self.rss())
+            await asyncio.sleep(self.interval)
+
+
+def start_server(port, scratch, sink_latency, writes_per_minute):
+    env = dict(
+        os.environ,
+        PA_STORAGE_SINK="fake_sheets",
+        PA_STORAGE_FAKE_LATENCY=str(sink_latency),
+        PA_STORAGE_FAKE_WRITES_PER_MINUTE=str(writes_per_minute),
+        PA_OUTBOX_PATH=os.path.join(scratch, "outbox.db"),
+        PA_AGGREGATES_PATH=os.path.join(scratch, "aggregates.db"),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", os.path.join(ROOT, "app.py"), "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=open(os.path.join(scratch, "server.log"), "wb"),
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with {server.returncode}; see {scratch}/server.log")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("server did not become healthy within 60s")
+
+
+async def run_load(url, sessions, concurrency, think_time, query_string, timeout, seed, monitor=None):
+    latencies = defaultdict(list)
+    failures = []
+    semaphore = asyncio.Semaphore(concurrency)
+    rng = random.Random(seed)
+
+    async def one(i):
+        async with semaphore:
+            try:
+                if not await run_session(url, query_string, think_time, timeout, random.Random(rng.random()), latencies):
+                    failures.append(f"session {i}: did not reach the results page")
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException, RuntimeError) as e:
+                failures.append(f"session {i}: {type(e).__name__}: {e}")
+
+    sampler = asyncio.ensure_future(monitor.sample()) if monitor else None
+    cpu_before = monitor.cpu_seconds() if monitor else None
+    rss_before = monitor.rss() if monitor else None
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - started
+    if sampler:
+        sampler.cancel()
+
+    completed = sessions - len(failures)
+    clicks = [value for values in latencies.values() for value in values]
+    report = {
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "completed": completed,
+        "failures": failures,
+        "seconds": elapsed,
+        "sessions_per_sec": completed / elapsed,
+        "clicks_per_sec": len(clicks) / elapsed,
+        "latency": {kind: percentiles(values) for kind, values in [("all", clicks), *sorted(latencies.items())]},
+    }
+    if monitor:
+        report["server"] = {
+            "cpu_seconds_per_session": (monitor.cpu_seconds() - cpu_before) / max(completed, 1),
+            "rss_before_mb": rss_before / 2**20,
+            "rss_peak_mb": monitor.peak_rss / 2**20,
+            "rss_per_concurrent_session_mb": (monitor.peak_rss - rss_before) / 2**20 / min(concurrency, sessions),
+        }
+    return report
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {"count": len(values), "p50_ms": p50 * 1000, "p90_ms": p90 * 1000, "p99_ms": p99 * 1000, "max_ms": max(values) * 1000}
+
+
+def format_report(report):
+    lines = [
+        f"{report['completed']}/{report['sessions']} sessions completed at concurrency {report['concurrency']}"
+        f" in {report['seconds']:.1f}s: {report['sessions_per_sec']:.2f} sessions/s, {report['clicks_per_sec']:.1f} clicks/s",
+        f"{'click':<10}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}",
+    ]
+    for kind, stats in report["latency"].items():
+        if stats["count"]:
+            lines.append(f"{kind:<10}{stats['count']:>8}{stats['p50_ms']:>10.1f}{stats['p90_ms']:>10.1f}"
+                         f"{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}")
+    server = report.get("server")
+    if server:
+        lines.append(
+            f"server: {server['cpu_seconds_per_session'] * 1000:.0f} ms CPU per session, RSS {server['rss_before_mb']:.0f}"
+            f" -> {server['rss_peak_mb']:.0f} MB peak ({server['rss_per_concurrent_session_mb']:.2f} MB per concurrent session)"
+        )
+    lines += report["failures"][:10]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50, help="respondents to run in total (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=10, help="respondents active at once (default: %(default)s)")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="mean seconds a respondent waits before each click (default: %(default)s)")
+    parser.add_argument("--sink-latency", type=float, default=0.2, help="fake Sheets seconds per write (default: %(default)s)")
+    parser.add_argument("--sink-writes-per-minute", type=int, default=60,
+                        help="fake Sheets write quota, 0 for none (default: %(default)s)")
+    parser.add_argument("--query", default="cohort=loadtest", help="query string of the respondents' link")
+    parser.add_argument("--url", help="ws:// URL of a running server instead of starting one")
+    parser.add_argument("--pid", type=int, help="with --url, the server's pid to report its CPU and memory")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for one rerun")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    url, pid = args.url, args.pid
+    if url is None:
+        scratch = tempfile.mkdtemp(prefix="pa-load-")
+        server = start_server(args.port, scratch, args.sink_latency, args.sink_writes_per_minute)
+        url, pid = f"ws://127.0.0.1:{args.port}", server.pid
+    try:
+        report = asyncio.run(run_load(
+            url.rstrip("/"), args.sessions, args.concurrency, args.think_time, args.query, args.timeout, args.seed,
+            ProcessMonitor(pid) if pid else None,
+        ))
+    finally:
+        if server:
+            server.terminate()
+            server.wait(10)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    if report["failures"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
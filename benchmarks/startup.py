@@ -0,0 +1,74 @@
+"""Cold-start report: how long a fresh interpreter takes to import the app module.
+
+Runs `python -X importtime -c "import app"` in new processes, keeps the
+fastest run, and summarizes the packages that dominate it and whether any
+of the lazily loaded dependencies crept back onto the import path:
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 5 --top 15 --budget-ms 1500
+"""
+import argparse
+from collections import defaultdict
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_MODULES = ("plotly.graph_objects", "pandas", "gspread")
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times(module):
+    """Imports module in a fresh interpreter and returns {module name: (self us, cumulative us, depth)}."""
+    scratch = tempfile.mkdtemp(prefix="pa-startup-")
+    env = dict(os.environ,
+               PA_OUTBOX_PATH=os.path.join(scratch, "outbox.db"),
+               PA_AGGREGATES_PATH=os.path.join(scratch, "aggregates.db"))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr}")
+    times = {}
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            times[name] = (int(own), int(cumulative), len(indent) // 2)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="number of top-level packages to list")
+    parser.add_argument("--budget-ms", type=float, help="fail when the fastest import takes longer than this")
+    args = parser.parse_args(argv)
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda times: times[args.module][1])
+    total_ms = best[args.module][1] / 1000
+
+    packages = defaultdict(int)
+    for name, (own, _, _) in best.items():
+        if name != args.module:
+            packages[name.split(".")[0]] += own
+    print(f"import {args.module}: {total_ms:,.1f} ms (best of {args.runs})")
+    print(f"{'package':<28}{'self ms':>10}")
+    for package, own in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{package:<28}{own / 1000:>10,.1f}")
+
+    eager = [name for name in LAZY_MODULES if name in best]
+    print(f"Lazy dependencies imported at startup: {', '.join(eager) if eager else 'none'}")
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"Startup import exceeds the {args.budget_ms:,.0f} ms budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
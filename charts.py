@@ -0,0 +1,86 @@
+"""The results donut as inline SVG, drawn directly from the scores.
+
+It mirrors the Plotly figure from resources.create_results_donut_chart():
+same colors, hole, pull on the highest slice and "label / percent" text,
+with slices sorted largest first and placed as Plotly's default
+counterclockwise direction places them: the first slice ends where a
+clockwise sweep of its size from 12 o'clock would, and each later slice
+follows counterclockwise from there. The page needs no chart library, and
+the server only formats a few hundred bytes of markup.
+"""
+from html import escape
+import math
+
+STYLE_COLORS = {'Driver': '#FF6B6B', 'Analytical': '#4ECDC4', 'Amiable': '#45B7D1', 'Expressive': '#FFA07A'}
+CHART_TITLE = 'Your Personality Style Profile'
+HOLE = 0.4
+PULL = 0.05
+# Plotly's layout for the figure: height 450, margins l=20 r=20 t=80 b=20, drawn here in a square viewBox.
+SIZE = 450
+MARGIN_TOP = 80
+MARGIN = 20
+
+
+def _text_color(fill):
+    """Plotly's contrast rule for text inside a slice: dark on light colors, white on dark ones."""
+    r, g, b = (int(fill[i:i + 2], 16) for i in (1, 3, 5))
+    return '#444' if (r * 299 + g * 587 + b * 114) / 1000 >= 128 else '#fff'
+
+
+def _point(cx, cy, radius, angle):
+    """Point at angle radians clockwise from 12 o'clock."""
+    return cx + radius * math.sin(angle), cy - radius * math.cos(angle)
+
+
+def _sector(cx, cy, outer, inner, start, end):
+    """SVG path of the ring between two angles."""
+    if end - start >= 2 * math.pi - 1e-9:
+        # A full ring: two half circles each way, the hole cut out by the even-odd rule.
+        return (f'M{cx:.2f} {cy - outer:.2f}A{outer:.2f} {outer:.2f} 0 1 1 {cx:.2f} {cy + outer:.2f}'
+                f'A{outer:.2f} {outer:.2f} 0 1 1 {cx:.2f} {cy - outer:.2f}Z'
+                f'M{cx:.2f} {cy - inner:.2f}A{inner:.2f} {inner:.2f} 0 1 0 {cx:.2f} {cy + inner:.2f}'
+                f'A{inner:.2f} {inner:.2f} 0 1 0 {cx:.2f} {cy - inner:.2f}Z')
+    large = 1 if end - start > math.pi else 0
+    x1, y1 = _point(cx, cy, outer, start)
+    x2, y2 = _point(cx, cy, outer, end)
+    x3, y3 = _point(cx, cy, inner, end)
+    x4, y4 = _point(cx, cy, inner, start)
+    return (f'M{x1:.2f} {y1:.2f}A{outer:.2f} {outer:.2f} 0 {large} 1 {x2:.2f} {y2:.2f}'
+            f'L{x3:.2f} {y3:.2f}A{inner:.2f} {inner:.2f} 0 {large} 0 {x4:.2f} {y4:.2f}Z')
+
+
+def donut_svg(scores):
+    """Returns the donut for a {style: score} dict as a single-line <svg> element."""
+    total = sum(scores.values())
+    top = max(scores.values(), default=0)
+    cx, cy = SIZE / 2, (MARGIN_TOP + SIZE - MARGIN) / 2
+    # Plotly shrinks the pie so a pulled slice still fits the plot area.
+    outer = min(SIZE - 2 * MARGIN, SIZE - MARGIN_TOP - MARGIN) / 2 / (1 + PULL)
+    inner = outer * HOLE
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {SIZE} {SIZE}" width="100%" height="{SIZE}"'
+        f' role="img" aria-label="{CHART_TITLE}" style="font-family: inherit; font-size: 14px;">',
+        f'<text x="{cx:.0f}" y="{0.05 * SIZE + 24:.0f}" text-anchor="middle"'
+        f' style="font-size: 24px; fill: var(--primary-color);">{CHART_TITLE}</text>',
+    ]
+    slices = [(style, score) for style, score in sorted(scores.items(), key=lambda item: -item[1]) if score > 0]
+    # Angles are clockwise from 12 o'clock; the first slice covers [0, a0], then the rest run counterclockwise.
+    angle = slices[0][1] / total * 2 * math.pi if slices else 0.0
+    for style, score in slices:
+        fraction = score / total
+        start, end = angle - fraction * 2 * math.pi, angle
+        angle = start
+        middle = (start + end) / 2
+        dx, dy = _point(0, 0, outer * PULL, middle) if score == top else (0, 0)
+        color = STYLE_COLORS[style]
+        label = escape(style)
+        tx, ty = _point(cx + dx, cy + dy, (outer + inner) / 2, middle)
+        parts.append(
+            f'<g><title>{label}: {score} ({fraction:.1%})</title>'
+            f'<path d="{_sector(cx + dx, cy + dy, outer, inner, start, end)}" fill="{color}"/>'
+            f'<text x="{tx:.2f}" y="{ty:.2f}" text-anchor="middle" fill="{_text_color(color)}">'
+            f'<tspan x="{tx:.2f}" dy="-0.2em">{label}</tspan><tspan x="{tx:.2f}" dy="1.2em">{fraction:.1%}</tspan>'
+            f'</text></g>'
+        )
+    parts.append('</svg>')
+    return ''.join(parts)
@@ -0,0 +1,115 @@
+"""Local Redis-protocol stand-in for running several app replicas against one session store.
+
+Implements the handful of commands the app uses (PING, GET, SET with EX/PX,
+DEL, EXPIRE, SELECT, AUTH) in memory, one thread per client:
+
+    python fake_redis.py --port 6379
+    PA_SESSIONS_STORE=redis PA_SESSIONS_URL=redis://localhost:6379/0 streamlit run app.py
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+from session_store import SessionStoreError, read_reply
+
+
+class Status(str):
+    """Simple-string reply."""
+
+
+class Error(str):
+    """Error reply."""
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    """In-memory key-value server speaking RESP; port 0 picks a free port."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), _Handler)
+        self.data = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self):
+        """Serves on a background thread and returns self."""
+        threading.Thread(target=self.serve_forever, name="fake-redis", daemon=True).start()
+        return self
+
+    def execute(self, args):
+        command, args = args[0].upper(), args[1:]
+        now = time.monotonic()
+        with self.lock:
+            if command == "PING":
+                return Status("PONG")
+            if command in ("SELECT", "AUTH"):
+                return Status("OK")
+            if command == "GET":
+                return self._get(args[0], now)
+            if command == "SET":
+                expires = None
+                for option, value in zip(args[2::2], args[3::2]):
+                    if option.upper() == "EX":
+                        expires = now + int(value)
+                    elif option.upper() == "PX":
+                        expires = now + int(value) / 1000
+                self.data[args[0]] = (args[1], expires)
+                return Status("OK")
+            if command == "DEL":
+                return sum(self.data.pop(key, None) is not None for key in args)
+            if command == "EXPIRE":
+                if self._get(args[0], now) is None:
+                    return 0
+                self.data[args[0]] = (self.data[args[0]][0], now + int(args[1]))
+                return 1
+        return Error(f"ERR unknown command '{command}'")
+
+    def _get(self, key, now):
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires <= now:
+            del self.data[key]
+            return None
+        return value
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                args = read_reply(self.rfile)
+            except (ConnectionError, ValueError, SessionStoreError):
+                return
+            reply = self.server.execute(args)
+            if reply is None:
+                data = b"$-1\r\n"
+            elif isinstance(reply, int):
+                data = f":{reply}\r\n".encode()
+            elif isinstance(reply, Status):
+                data = f"+{reply}\r\n".encode()
+            elif isinstance(reply, Error):
+                data = f"-{reply}\r\n".encode()
+            else:
+                encoded = reply.encode()
+                data = f"${len(encoded)}\r\n".encode() + encoded + b"\r\n"
+            self.wfile.write(data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args(argv)
+    server = FakeRedisServer(args.host, args.port)
+    print(f"Serving {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""In-process stand-in for a Google Sheets worksheet, for offline load tests and benchmarks.
+
+FakeSheetsConnection has the worksheet()/invalidate() interface of
+sheets.SheetConnection, so it plugs into SheetsSink and exercises the real
+submission path: each append_rows call sleeps for a jittered latency and
+fails with the same gspread APIError (HTTP 429) that Sheets raises once the
+per-minute write quota is used up, or at random with error_rate.
+"""
+from collections import deque
+import json
+import random
+import threading
+import time
+
+import gspread
+import requests
+
+
+def api_error(code, message):
+    """Builds the gspread.exceptions.APIError that an HTTP error response from Sheets produces."""
+    response = requests.Response()
+    response.status_code = code
+    response._content = json.dumps({"error": {"code": code, "message": message, "status": "ERROR"}}).encode()
+    return gspread.exceptions.APIError(response)
+
+
+class FakeWorksheet:
+    """Keeps appended rows in memory and emulates append_rows latency and quota errors."""
+
+    def __init__(self, latency=0.2, jitter=0.5, writes_per_minute=60, error_rate=0.0, seed=None):
+        self.rows = []
+        self.calls = 0
+        self.rejected = 0
+        self._latency = latency
+        self._jitter = jitter
+        self._writes_per_minute = writes_per_minute
+        self._error_rate = error_rate
+        self._random = random.Random(seed)
+        self._writes = deque()
+        self._lock = threading.Lock()
+
+    def append_rows(self, values, **kwargs):
+        with self._lock:
+            self.calls += 1
+            delay = self._latency * self._random.uniform(1 - self._jitter, 1 + self._jitter)
+            now = time.monotonic()
+            while self._writes and self._writes[0] <= now - 60:
+                self._writes.popleft()
+            throttled = (self._writes_per_minute and len(self._writes) >= self._writes_per_minute
+                         or self._random.random() < self._error_rate)
+            if not throttled:
+                self._writes.append(now)
+        time.sleep(delay)
+        if throttled:
+            with self._lock:
+                self.rejected += 1
+            raise api_error(429, "Quota exceeded for quota metric 'Write requests' (fake)")
+        with self._lock:
+            self.rows.extend(list(row) for row in values)
+        return {"updates": {"updatedRows": len(values)}}
+
+
+class FakeSheetsConnection:
+    """SheetConnection look-alike that always returns the same FakeWorksheet."""
+
+    def __init__(self, **worksheet_options):
+        self.sheet = FakeWorksheet(**worksheet_options)
+        self.invalidations = 0
+
+    def worksheet(self):
+        return self.sheet
+
+    def invalidate(self):
+        self.invalidations += 1
@@ -0,0 +1,110 @@
+"""Assessment instruments loaded from JSON or YAML files, recompiled when the file changes.
+
+Each file in the instruments directory defines one instrument, named after
+the file: a title, the questions with "(Style)"-labelled choices, the
+scoring_map ({question number: {letter: style}}) and style_descriptions.
+Instruments share the four styles in scoring.STYLES, so results from every
+variant fit the same sheet columns, chart and dashboard.
+"""
+from collections import namedtuple
+import hashlib
+import json
+import os
+import re
+import threading
+
+from question_bank import compile_questions, compile_style_descriptions
+
+INSTRUMENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instruments")
+DEFAULT_INSTRUMENT = "disc18"
+EXTENSIONS = (".json", ".yaml", ".yml")
+VALID_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+Instrument = namedtuple("Instrument", "id version title questions style_matrix style_descriptions")
+
+
+def parse_instrument(path, data):
+    """Parses the raw bytes of an instrument file according to its extension."""
+    if path.endswith(".json"):
+        return json.loads(data)
+    try:
+        import yaml
+    except ImportError:
+        raise ValueError(f"PyYAML is required to load {path}") from None
+    return yaml.safe_load(data)
+
+
+def compile_instrument(instrument_id, spec, version=""):
+    """Validates a parsed instrument definition and compiles it into an Instrument."""
+    missing = {"title", "questions", "scoring_map", "style_descriptions"} - set(spec)
+    if missing:
+        raise ValueError(f"instrument {instrument_id!r} is missing {sorted(missing)}")
+    mapping = {int(number): choices for number, choices in spec["scoring_map"].items()}
+    questions, style_matrix = compile_questions(spec["questions"], mapping)
+    return Instrument(
+        instrument_id,
+        version,
+        spec["title"],
+        questions,
+        style_matrix,
+        compile_style_descriptions(spec["style_descriptions"]),
+    )
+
+
+def load_instrument(path):
+    """Reads, validates and compiles one instrument file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    instrument_id = os.path.splitext(os.path.basename(path))[0]
+    return compile_instrument(instrument_id, parse_instrument(path, data), hashlib.sha256(data).hexdigest()[:12])
+
+
+class InstrumentRegistry:
+    """Compiled instruments from a directory, keyed by file name.
+
+    get() costs one stat() per call: a file is only re-read and recompiled
+    when its modification time changes. If a changed file fails to compile,
+    the previously compiled version keeps serving and the error is printed.
+    """
+
+    def __init__(self, directory=INSTRUMENTS_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._compiled = {}
+
+    def available(self):
+        """Ids of the instrument files in the directory."""
+        return sorted(
+            os.path.splitext(name)[0] for name in os.listdir(self.directory)
+            if name.endswith(EXTENSIONS)
+        )
+
+    def get(self, instrument_id):
+        """Returns the current compiled instrument; raises KeyError if no file defines it."""
+        path = self._path(instrument_id)
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._compiled.get(instrument_id)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with self._lock:
+            cached = self._compiled.get(instrument_id)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            try:
+                instrument = load_instrument(path)
+            except Exception as e:
+                if cached is None:
+                    raise
+                print(f"Error reloading instrument {instrument_id}, keeping the previous version: {e}")
+                instrument = cached[1]
+            self._compiled[instrument_id] = (mtime, instrument)
+            return instrument
+
+    def _path(self, instrument_id):
+        if not VALID_ID.match(instrument_id):
+            raise KeyError(instrument_id)
+        for extension in EXTENSIONS:
+            path = os.path.join(self.directory, instrument_id + extension)
+            if os.path.exists(path):
+                return path
+        raise KeyError(instrument_id)
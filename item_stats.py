@@ -0,0 +1,413 @@
+"""Item-level psychometrics of an instrument, computed in one streaming pass over stored results.
+
+For every question it reports how often each choice is picked, the corrected
+item-total (item-rest) correlation of each choice with its style's scale and
+Cramér's V between the choice and the respondent's dominant style; for every
+style scale the mean, standard deviation and Cronbach's alpha. ItemStats only
+keeps counts and running moments, so chunks are summarized in parallel and
+merged, and a saved state is topped up with the results added since instead
+of rescanning the history:
+
+    python item_stats.py results_parquet --state item_stats.json --workers 4
+    python item_stats.py results.db --state item_stats.json
+    python item_stats.py export.csv --header --instrument disc18 --json
+"""
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from itertools import islice
+import json
+import math
+import os
+import sqlite3
+
+import numpy as np
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from instruments import DEFAULT_INSTRUMENT, InstrumentRegistry
+from rescore import FORMATS, chunked, detect_format, parse_letters
+from results_store import QUESTION_COLUMNS, SCHEMA, compacted_sources, live_files, partition_day, partitions, read_lock
+from scoring import CHOICE_LETTERS, STYLES, UNANSWERED, score_batch
+from sinks import RESULT_COLUMNS
+
+STATE_FIELDS = ("choice_counts", "dominant_counts", "item_mean", "item_m2", "scale_mean", "scale_m2", "item_scale_c")
+
+
+class ItemStats:
+    """Mergeable running statistics of response arrays scored with one style matrix.
+
+    Choice counts cover every answered question. The moments behind the
+    correlations and alpha cover complete response sets only, with each
+    question scored as a 0/1 indicator per style (the respondent's scale score
+    is the sum of a style's indicators). They are kept as means and sums of
+    squared deviations and combined with the pairwise update of Chan et al.,
+    which stays accurate over millions of rows where running sums of squares
+    would not. The dominant-style tables count respondents with a single
+    dominant style.
+    """
+
+    def __init__(self, style_matrix):
+        self.style_matrix = np.asarray(style_matrix)
+        n_questions, n_choices = self.style_matrix.shape
+        n_styles = len(STYLES)
+        self.rows = 0
+        self.n = 0
+        self.choice_counts = np.zeros((n_questions, n_choices), dtype=np.int64)
+        self.dominant_counts = np.zeros((n_questions, n_choices, n_styles), dtype=np.int64)
+        self.item_mean = np.zeros((n_questions, n_styles))
+        self.item_m2 = np.zeros((n_questions, n_styles))
+        self.scale_mean = np.zeros(n_styles)
+        self.scale_m2 = np.zeros(n_styles)
+        self.item_scale_c = np.zeros((n_questions, n_styles))
+
+    def update(self, responses):
+        """Adds an (N, questions) array of choice indexes, UNANSWERED for skipped questions; returns self."""
+        responses = np.asarray(responses)
+        counts, dominant = score_batch(responses, self.style_matrix)
+        n_questions, n_choices = self.style_matrix.shape
+        n_styles = len(STYLES)
+        self.rows += len(responses)
+        answered = responses != UNANSWERED
+        cells = np.arange(n_questions) * n_choices + responses
+        self.choice_counts += np.bincount(cells[answered], minlength=n_questions * n_choices).reshape(n_questions, n_choices)
+
+        complete = answered.all(axis=1)
+        if not complete.any():
+            return self
+        responses, counts, dominant, cells = responses[complete], counts[complete], dominant[complete], cells[complete]
+        single = dominant.sum(axis=1) == 1
+        style_cells = cells[single] * n_styles + dominant[single].argmax(axis=1)[:, None]
+        self.dominant_counts += np.bincount(
+            style_cells.ravel(), minlength=self.dominant_counts.size
+        ).reshape(self.dominant_counts.shape)
+
+        items = self.style_matrix[np.arange(n_questions), responses][:, :, None] == np.arange(n_styles)
+        items = items.astype(np.float64)
+        scales = counts.astype(np.float64)
+        item_mean, scale_mean = items.mean(axis=0), scales.mean(axis=0)
+        item_dev, scale_dev = items - item_mean, scales - scale_mean
+        self._combine(
+            len(responses), item_mean, (item_dev ** 2).sum(axis=0), scale_mean, (scale_dev ** 2).sum(axis=0),
+            np.einsum("nqs,ns->qs", item_dev, scale_dev),
+        )
+        return self
+
+    def merge(self, other):
+        """Adds the statistics of another ItemStats over the same style matrix; returns self."""
+        if not np.array_equal(self.style_matrix, other.style_matrix):
+            raise ValueError("cannot merge item statistics of different style matrices")
+        self.rows += other.rows
+        self.choice_counts += other.choice_counts
+        self.dominant_counts += other.dominant_counts
+        self._combine(other.n, other.item_mean, other.item_m2, other.scale_mean, other.scale_m2, other.item_scale_c)
+        return self
+
+    def _combine(self, n, item_mean, item_m2, scale_mean, scale_m2, item_scale_c):
+        if not n:
+            return
+        total = self.n + n
+        weight = self.n * n / total
+        item_delta = item_mean - self.item_mean
+        scale_delta = scale_mean - self.scale_mean
+        self.item_mean = self.item_mean + item_delta * (n / total)
+        self.scale_mean = self.scale_mean + scale_delta * (n / total)
+        self.item_m2 = self.item_m2 + item_m2 + item_delta ** 2 * weight
+        self.scale_m2 = self.scale_m2 + scale_m2 + scale_delta ** 2 * weight
+        self.item_scale_c = self.item_scale_c + item_scale_c + item_delta * scale_delta * weight
+        self.n = total
+
+    def report(self):
+        """Returns the item and scale statistics as plain values, None where one is undefined."""
+        n_questions, n_choices = self.style_matrix.shape
+        # Sums of squared deviations stand in for variances: the 1/n factors cancel in every ratio below.
+        rest_c = self.item_scale_c - self.item_m2
+        rest_m2 = self.scale_m2 - 2 * self.item_scale_c + self.item_m2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            item_rest_r = rest_c / np.sqrt(self.item_m2 * rest_m2)
+        items = []
+        for q in range(n_questions):
+            answered = int(self.choice_counts[q].sum())
+            items.append({
+                "question": q + 1,
+                "answered": answered,
+                "cramers_v": cramers_v(self.dominant_counts[q]),
+                "choices": [{
+                    "choice": CHOICE_LETTERS[c].upper(),
+                    "style": STYLES[self.style_matrix[q, c]],
+                    "count": int(self.choice_counts[q, c]),
+                    "proportion": float(self.choice_counts[q, c] / answered) if answered else None,
+                    "item_rest_r": _finite(item_rest_r[q, self.style_matrix[q, c]]),
+                } for c in range(n_choices)],
+            })
+        scales = {}
+        for s, style in enumerate(STYLES):
+            k = int((self.style_matrix == s).any(axis=1).sum())
+            alpha = None
+            if k > 1 and self.scale_m2[s] > 0:
+                alpha = float(k / (k - 1) * (1 - self.item_m2[:, s].sum() / self.scale_m2[s]))
+            scales[style] = {
+                "items": k,
+                "mean": float(self.scale_mean[s]) if self.n else None,
+                "sd": math.sqrt(self.scale_m2[s] / (self.n - 1)) if self.n > 1 else None,
+                "alpha": alpha,
+            }
+        return {"rows": self.rows, "complete": self.n, "items": items, "scales": scales}
+
+    def to_dict(self):
+        return {"rows": self.rows, "n": self.n, **{field: getattr(self, field).tolist() for field in STATE_FIELDS}}
+
+    @classmethod
+    def from_dict(cls, style_matrix, data):
+        stats = cls(style_matrix)
+        stats.rows, stats.n = data["rows"], data["n"]
+        for field in STATE_FIELDS:
+            value = np.array(data[field], dtype=getattr(stats, field).dtype)
+            if value.shape != getattr(stats, field).shape:
+                raise ValueError(f"saved {field} has shape {value.shape}, expected {getattr(stats, field).shape}")
+            setattr(stats, field, value)
+        return stats
+
+
+def cramers_v(table):
+    """Cramér's V of a contingency table; None if it has fewer than two non-empty rows or columns."""
+    table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+    if min(table.shape) < 2:
+        return None
+    total = table.sum()
+    expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / total
+    chi2 = ((table - expected) ** 2 / expected).sum()
+    return math.sqrt(chi2 / (total * (min(table.shape) - 1)))
+
+
+def _finite(value):
+    return float(value) if np.isfinite(value) else None
+
+
+def stored_instrument(instrument):
+    """The instrument cell of a stored result: empty for the default instrument."""
+    return None if instrument.id == DEFAULT_INSTRUMENT else instrument.id
+
+
+def row_stats(rows, style_matrix, instrument_cell):
+    """Summarizes the sheet-layout rows of one instrument."""
+    rows = [row for row in rows if _instrument_cell(row) == instrument_cell]
+    return ItemStats(style_matrix).update(parse_letters(rows, style_matrix.shape[0]))
+
+
+def _instrument_cell(row):
+    return row[len(RESULT_COLUMNS) - 1] if len(row) >= len(RESULT_COLUMNS) else None
+
+
+def parquet_stats(paths, style_matrix, instrument_cell, batch_size=65536):
+    """Summarizes the results of one instrument in Parquet files, one record batch at a time."""
+    columns = list(QUESTION_COLUMNS[:style_matrix.shape[0]])
+    field = ds.field("instrument")
+    stats = ItemStats(style_matrix)
+    dataset = ds.dataset(paths, schema=SCHEMA, format="parquet")
+    for batch in dataset.to_batches(
+            columns=columns, filter=field.is_null() if instrument_cell is None else field == instrument_cell,
+            batch_size=batch_size):
+        # Unanswered questions are null; filled with 255, they wrap to UNANSWERED (-1) as int8.
+        stats.update(np.column_stack(
+            [pc.fill_null(batch.column(column), 255).to_numpy().astype(np.int8) for column in columns]
+        ).reshape(batch.num_rows, len(columns)))
+    return stats
+
+
+def map_stats(func, jobs, workers):
+    """Yields func(*job) for each job, keeping at most two jobs per worker in flight."""
+    if workers <= 1:
+        yield from (func(*job) for job in jobs)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        in_flight = deque()
+        for job in jobs:
+            in_flight.append(pool.submit(func, *job))
+            if len(in_flight) >= 2 * workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def update_parquet(state, directory, style_matrix, instrument_cell, workers=1, start=None, end=None):
+    """Brings per-partition statistics up to date, reading only files that are not yet counted.
+
+    A compacted file whose inputs were all counted carries their statistics
+    over; a partition whose counted files were otherwise removed is rescanned.
+    Returns the merged statistics of the partitions between start and end.
+    """
+    saved = state.get("partitions", {})
+    state["partitions"] = {}
+    selected = []
+    for partition in partitions(directory):
+        day = partition_day(partition)
+        if (start is not None and day < start) or (end is not None and day > end):
+            if day.isoformat() in saved:
+                state["partitions"][day.isoformat()] = saved[day.isoformat()]
+        else:
+            selected.append(partition)
+
+    bases, jobs = {}, []
+    # Held until every listed file is read, so a compaction cannot delete one in between.
+    with read_lock(selected):
+        for partition in selected:
+            day = partition_day(partition).isoformat()
+            files = live_files(partition)
+            base, new = _carry_over(partition, files, saved.get(day), style_matrix)
+            bases[day] = (base, files)
+            if new:
+                jobs.append((day, [os.path.join(partition, name) for name in new]))
+
+        results = map_stats(parquet_stats, [(paths, style_matrix, instrument_cell) for _, paths in jobs], workers)
+        for (day, _), stats in zip(jobs, results):
+            bases[day][0].merge(stats)
+    total = ItemStats(style_matrix)
+    for day, (stats, files) in bases.items():
+        state["partitions"][day] = {"files": files, "stats": stats.to_dict()}
+        total.merge(stats)
+    return total
+
+
+def _carry_over(partition, files, saved, style_matrix):
+    """Returns the partition's counted statistics and the files still to read."""
+    if saved is None:
+        return ItemStats(style_matrix), files
+    counted = set(saved["files"])
+    covered, new = set(), []
+    for name in files:
+        if name in counted:
+            covered.add(name)
+            continue
+        sources = set(compacted_sources(os.path.join(partition, name))) if name.startswith("compacted-") else set()
+        if sources and sources <= counted:
+            covered |= sources
+        else:
+            new.append(name)
+    if covered != counted:
+        return ItemStats(style_matrix), files
+    return ItemStats.from_dict(style_matrix, saved["stats"]), new
+
+
+def update_rows(state, rows, style_matrix, instrument_cell, workers=1, chunk_size=10000):
+    """Adds sheet-layout rows past the saved position; rows yields (position, row) pairs."""
+    stats = ItemStats.from_dict(style_matrix, state["stats"]) if "stats" in state else ItemStats(style_matrix)
+    last = [state.get("position", 0)]
+
+    def chunks():
+        for chunk in chunked(rows, chunk_size):
+            last[0] = chunk[-1][0]
+            yield [row for _, row in chunk], style_matrix, instrument_cell
+
+    for chunk_stats in map_stats(row_stats, chunks(), workers):
+        stats.merge(chunk_stats)
+    state["position"] = last[0]
+    state["stats"] = stats.to_dict()
+    return stats
+
+
+def sqlite_rows(path, after_id, instrument_cell):
+    """Yields (id, row) for the SQLite sink's results after the given id."""
+    quoted = ", ".join(f'"{column}"' for column in RESULT_COLUMNS)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        query = f"SELECT id, {quoted} FROM results WHERE id > ? AND instrument IS ? ORDER BY id"
+        for row in conn.execute(query, (after_id, instrument_cell)):
+            yield row[0], row[1:]
+    finally:
+        conn.close()
+
+
+def export_rows(path, fmt, skip, header=False):
+    """Yields (row number, row) for a CSV or NDJSON export after the first skip rows.
+
+    Exports are expected to only grow, as the CSV sink's file does.
+    """
+    read = FORMATS[fmt][0]
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = read(f)
+        if header and fmt == "csv":
+            next(rows, None)
+        yield from islice(enumerate(rows, start=1), skip, None)
+
+
+def update_stats(source, instrument, state=None, workers=1, chunk_size=10000, header=False, start=None, end=None):
+    """Returns ItemStats for an instrument's results in a source, updating state in place.
+
+    The source is a Parquet results directory, a SQLite sink database or a
+    CSV/NDJSON export. A state saved for another source or other scoring
+    tables is discarded.
+    """
+    style_matrix = instrument.style_matrix
+    key = {"source": os.path.abspath(source), "instrument": instrument.id, "style_matrix": style_matrix.tolist()}
+    if state is None:
+        state = {}
+    if any(state.get(name) != value for name, value in key.items()):
+        state.clear()
+        state.update(key)
+    instrument_cell = stored_instrument(instrument)
+    if os.path.isdir(source):
+        return update_parquet(state, source, style_matrix, instrument_cell, workers, start, end)
+    if source.endswith((".db", ".sqlite", ".sqlite3")):
+        rows = sqlite_rows(source, state.get("position", 0), instrument_cell)
+    else:
+        rows = export_rows(source, detect_format(source), state.get("position", 0), header)
+    return update_rows(state, rows, style_matrix, instrument_cell, workers, chunk_size)
+
+
+def load_state(path):
+    if path is None or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    """Writes under a temporary name and renames, so an interrupted run keeps the previous state."""
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def format_report(report):
+    lines = [f"{report['rows']} results, {report['complete']} complete"]
+    for item in report["items"]:
+        v = item["cramers_v"]
+        lines.append(f"Q{item['question']:<3} answered {item['answered']:>9}   Cramér's V {'-' if v is None else f'{v:.3f}':>6}")
+        for choice in item["choices"]:
+            p, r = choice["proportion"], choice["item_rest_r"]
+            lines.append(
+                f"    {choice['choice']} {choice['style']:<12}{'-' if p is None else f'{p:.1%}':>8}"
+                f"   item-rest r {'-' if r is None else f'{r:+.3f}':>7}"
+            )
+    for style, scale in report["scales"].items():
+        values = {name: "-" if scale[name] is None else f"{scale[name]:.3f}" for name in ("mean", "sd", "alpha")}
+        lines.append(f"{style:<12}{scale['items']:>3} items   mean {values['mean']:>7}   sd {values['sd']:>6}   alpha {values['alpha']:>6}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="Parquet results directory, SQLite sink database, or CSV/NDJSON export")
+    parser.add_argument("--instrument", default=DEFAULT_INSTRUMENT, help="instrument id (default: %(default)s)")
+    parser.add_argument("--state", help="JSON file with the statistics so far, updated with results added since")
+    parser.add_argument("--header", action="store_true", help="skip the first CSV row")
+    parser.add_argument("--start", type=date.fromisoformat, help="first day to report (Parquet only)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day to report (Parquet only)")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    instrument = InstrumentRegistry().get(args.instrument)
+    state = load_state(args.state)
+    stats = update_stats(args.source, instrument, state, args.workers, args.chunk_size, args.header, args.start, args.end)
+    if args.state:
+        save_state(args.state, state)
+    report = stats.report()
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
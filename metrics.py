@@ -0,0 +1,195 @@
+"""Process-wide counters, gauges and latency summaries for the hot paths.
+
+Modules record into the shared REGISTRY. Its contents can be served as
+Prometheus text from a small HTTP listener, or dumped to a JSON file at a
+fixed interval.
+"""
+from collections import deque
+import functools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+import time
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Summary:
+    """Count and sum of all observations plus quantiles over the most recent window."""
+
+    def __init__(self, window=2048):
+        self._recent = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self._recent.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantiles(self):
+        recent = sorted(self._recent)
+        if not recent:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: recent[min(len(recent) - 1, int(q * len(recent)))] for q in QUANTILES}
+
+
+class _Timer:
+    def __init__(self, registry, name, labels):
+        self._registry = registry
+        self._name = name
+        self._labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._registry.observe(self._name, time.perf_counter() - self._start, **self._labels)
+        return False
+
+    def __call__(self, func):
+        # A fresh timer per call, so concurrent sessions never share a start time.
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Timer(self._registry, self._name, self._labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class Registry:
+    """Thread-safe metrics keyed by name and label set."""
+
+    def __init__(self, window=2048):
+        self._window = window
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._summaries = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = Summary(self._window)
+            summary.observe(value)
+
+    def gauge(self, name, read, **labels):
+        """Registers a callable that is read whenever the metrics are exported."""
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = read
+
+    def timed(self, name, **labels):
+        """Context manager and decorator that observes the elapsed seconds under name."""
+        return _Timer(self, name, labels)
+
+    def snapshot(self):
+        """Returns every metric as plain data."""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            summaries = {key: (s.count, s.total, s.quantiles()) for key, s in self._summaries.items()}
+        gauge_values = {}
+        for key, read in gauges.items():
+            try:
+                gauge_values[key] = read()
+            except Exception as e:
+                print(f"Error reading gauge {key[0]}: {e}")
+        return {
+            "counters": [_entry(key, value=value) for key, value in sorted(counters.items())],
+            "gauges": [_entry(key, value=value) for key, value in sorted(gauge_values.items())],
+            "summaries": [
+                _entry(key, count=count, sum=total, quantiles={str(q): v for q, v in quantiles.items()})
+                for key, (count, total, quantiles) in sorted(summaries.items())
+            ],
+        }
+
+    def prometheus(self):
+        """Renders the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for entry in snapshot["counters"]:
+            declare(entry["name"], "counter")
+            lines.append(f"{entry['name']}{_labels(entry['labels'])} {entry['value']}")
+        for entry in snapshot["gauges"]:
+            declare(entry["name"], "gauge")
+            lines.append(f"{entry['name']}{_labels(entry['labels'])} {entry['value']}")
+        for entry in snapshot["summaries"]:
+            declare(entry["name"], "summary")
+            for q, value in entry["quantiles"].items():
+                lines.append(f"{entry['name']}{_labels(dict(entry['labels'], quantile=q))} {value}")
+            lines.append(f"{entry['name']}_sum{_labels(entry['labels'])} {entry['sum']}")
+            lines.append(f"{entry['name']}_count{_labels(entry['labels'])} {entry['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _entry(key, **fields):
+    name, labels = key
+    return {"name": name, "labels": dict(labels), **fields}
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = Registry()
+
+
+def serve_prometheus(port, registry=REGISTRY, host="0.0.0.0"):
+    """Serves GET /metrics on a background thread and returns the server."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_json_dump(path, interval=60.0, registry=REGISTRY):
+    """Rewrites path with a JSON snapshot every interval seconds on a background thread."""
+    def dump():
+        while True:
+            time.sleep(interval)
+            try:
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(dict(registry.snapshot(), time=time.time()), f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Error writing metrics to {path}: {e}")
+
+    thread = threading.Thread(target=dump, name="metrics-dump", daemon=True)
+    thread.start()
+    return thread
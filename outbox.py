@@ -0,0 +1,307 @@
+"""Durable local outbox for completed assessments awaiting delivery, and the worker that delivers them to a sink.
+
+Rows the sink rejected are dead-lettered; once the cause is fixed, make them
+pending again for the running app to deliver:
+
+    python outbox.py results_outbox.db
+    python outbox.py results_outbox.db --requeue-dead
+"""
+import argparse
+import atexit
+import json
+import random
+import sqlite3
+import threading
+import time
+
+from metrics import REGISTRY
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    leased_until REAL,
+    delivered REAL,
+    last_error TEXT,
+    dead REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (id) WHERE delivered IS NULL;
+"""
+
+
+class Outbox:
+    """SQLite (WAL mode) table of result rows, each committed before the respondent sees results.
+
+    Every thread gets its own connection, so concurrent Streamlit sessions can
+    add rows while the replay worker claims and delivers them. Claimed rows are
+    leased for a while so a second process sharing the file does not send the
+    same rows twice; rows whose lease expires without delivery are claimed again.
+    Rows the sink will never accept are moved to a dead-letter state, kept for
+    inspection but no longer claimed, so they cannot block the rows behind them.
+    """
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self._busy_timeout = busy_timeout
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        # Outboxes created before dead-lettering lack the column.
+        if "dead" not in {column[1] for column in conn.execute("PRAGMA table_info(outbox)")}:
+            conn.execute("ALTER TABLE outbox ADD COLUMN dead REAL")
+
+    def add(self, row):
+        """Commits a row to the outbox and returns its id."""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO outbox (created, payload) VALUES (?, ?)",
+                (time.time(), json.dumps(row)),
+            )
+        return cursor.lastrowid
+
+    def add_many(self, rows):
+        """Commits several rows in one transaction."""
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT INTO outbox (created, payload) VALUES (?, ?)",
+                [(now, json.dumps(row)) for row in rows],
+            )
+
+    def claim(self, limit, lease=60.0):
+        """Leases up to limit undelivered rows and returns them as (id, row) pairs."""
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            claimed = conn.execute(
+                "SELECT id, payload FROM outbox WHERE delivered IS NULL AND dead IS NULL"
+                " AND (leased_until IS NULL OR leased_until < ?) ORDER BY id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET leased_until = ? WHERE id = ?",
+                [(now + lease, row_id) for row_id, _ in claimed],
+            )
+        return [(row_id, json.loads(payload)) for row_id, payload in claimed]
+
+    def mark_delivered(self, ids):
+        with self._connection() as conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "UPDATE outbox SET delivered = ?, leased_until = NULL WHERE id = ?",
+                [(time.time(), row_id) for row_id in ids],
+            )
+
+    def mark_failed(self, ids, error):
+        """Releases the lease and records the error so the rows are retried."""
+        with self._connection() as conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, leased_until = NULL, last_error = ? WHERE id = ?",
+                [(str(error), row_id) for row_id in ids],
+            )
+
+    def release(self, ids):
+        """Ends the lease without counting an attempt, so the rows are claimed again right away."""
+        with self._connection() as conn:
+            conn.execute("BEGIN")
+            conn.executemany("UPDATE outbox SET leased_until = NULL WHERE id = ?", [(row_id,) for row_id in ids])
+
+    def mark_dead(self, ids, error):
+        """Records the error and stops retrying the rows."""
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, leased_until = NULL, last_error = ?, dead = ? WHERE id = ?",
+                [(str(error), now, row_id) for row_id in ids],
+            )
+
+    def requeue_dead(self):
+        """Makes every dead-lettered row pending again (after fixing the sink) and returns how many."""
+        with self._connection() as conn:
+            return conn.execute(
+                "UPDATE outbox SET dead = NULL, attempts = 0 WHERE dead IS NOT NULL AND delivered IS NULL"
+            ).rowcount
+
+    def dead_errors(self, limit=20):
+        """(id, last_error) of the oldest dead-lettered rows."""
+        return self._connection().execute(
+            "SELECT id, last_error FROM outbox WHERE dead IS NOT NULL AND delivered IS NULL ORDER BY id LIMIT ?", (limit,)
+        ).fetchall()
+
+    def pending_count(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM outbox WHERE delivered IS NULL AND dead IS NULL"
+        ).fetchone()[0]
+
+    def dead_count(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM outbox WHERE dead IS NOT NULL AND delivered IS NULL"
+        ).fetchone()[0]
+
+    def purge_delivered(self, older_than):
+        """Deletes rows delivered more than older_than seconds ago."""
+        with self._connection() as conn:
+            conn.execute(
+                "DELETE FROM outbox WHERE delivered IS NOT NULL AND delivered < ?",
+                (time.time() - older_than,),
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self._busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+class SheetWriter:
+    """Process-wide replay worker that drains the outbox into batched sink writes.
+
+    Rows from every session are committed to the outbox first. The thread
+    claims whatever has accumulated (up to batch_size rows) into a single
+    append_many call, spaces calls out to stay within writes_per_minute, and
+    backs off exponentially while the sink is throttling or unavailable. Rows
+    are only marked delivered after a successful append, so nothing is lost
+    to quota storms, outages or restarts.
+
+    A batch that fails with an error retrying won't fix is halved until the
+    failing row is alone, and that row is dead-lettered so the rows behind it
+    keep draining. Retryable errors (quota, outages) never dead-letter a row,
+    however long they last.
+    """
+
+    def __init__(self, sink, outbox, writes_per_minute=50, batch_size=500,
+                 base_backoff=1.0, max_backoff=300.0, replay_interval=30.0,
+                 retention=7 * 24 * 3600, flush_timeout=10.0):
+        self._sink = sink
+        self._outbox = outbox
+        self._min_interval = 60.0 / writes_per_minute
+        self._batch_size = batch_size
+        self._base_backoff = base_backoff
+        self._max_backoff = max_backoff
+        self._replay_interval = replay_interval
+        self._retention = retention
+        self._flush_timeout = flush_timeout
+        self._claim_limit = batch_size
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._failures = 0
+        self._last_write = 0.0
+        self._thread = threading.Thread(target=self._run, name="sheet-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, row):
+        """Commits a row to the outbox and wakes the writer; returns immediately after the commit."""
+        self._outbox.add(row)
+        self._wake.set()
+
+    def enqueue_many(self, rows):
+        """Commits rows to the outbox in one transaction and wakes the writer."""
+        self._outbox.add_many(rows)
+        self._wake.set()
+
+    def pending(self):
+        """Number of rows not yet delivered to the sheet."""
+        return self._outbox.pending_count()
+
+    def dead(self):
+        """Number of dead-lettered rows, which are no longer retried."""
+        return self._outbox.dead_count()
+
+    def close(self):
+        """Flushes pending rows (within flush_timeout) and stops the writer thread."""
+        if self._thread.is_alive():
+            self._stopping.set()
+            self._wake.set()
+            self._thread.join(self._flush_timeout)
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            delivered = self._replay()
+            if self._stopping.is_set():
+                self._sink.flush()
+                return
+            if delivered:
+                self._outbox.purge_delivered(self._retention)
+            if self._failures:
+                self._stopping.wait(self._backoff())
+            else:
+                self._wake.wait(self._replay_interval)
+
+    def _replay(self):
+        """Delivers pending batches until the outbox is empty or a write fails."""
+        delivered = False
+        while True:
+            self._wait_for_budget()
+            batch = self._outbox.claim(self._claim_limit)
+            if not batch:
+                self._claim_limit = self._batch_size
+                return delivered
+            ids = [row_id for row_id, _ in batch]
+            if self._failures:
+                REGISTRY.inc("sheet_write_retries_total")
+            try:
+                self._last_write = time.monotonic()
+                with REGISTRY.timed("sheet_write_seconds"):
+                    self._sink.append_many([row for _, row in batch])
+            except Exception as e:
+                REGISTRY.inc("sheet_write_failures_total", reason=self._sink.error_reason(e))
+                if not self._sink.is_retryable(e):
+                    if len(batch) > 1:
+                        # One bad row fails the whole append: retry in halves until it is alone.
+                        self._outbox.release(ids)
+                        self._claim_limit = (len(batch) + 1) // 2
+                        continue
+                    self._outbox.mark_dead(ids, e)
+                    self._claim_limit = self._batch_size
+                    REGISTRY.inc("sheet_rows_dead_lettered_total")
+                    print(f"Error writing results to {self._sink.name} (row {ids[0]} dead-lettered): {e}")
+                    continue
+                self._outbox.mark_failed(ids, e)
+                self._failures += 1
+                self._claim_limit = self._batch_size
+                print(f"Error writing results to {self._sink.name} ({len(ids)} rows kept for retry): {e}")
+                return delivered
+            self._outbox.mark_delivered(ids)
+            REGISTRY.inc("sheet_rows_written_total", len(ids))
+            REGISTRY.observe("sheet_write_batch_rows", len(ids))
+            self._failures = 0
+            delivered = True
+
+    def _backoff(self):
+        """Jittered exponential delay."""
+        backoff = min(self._max_backoff, self._base_backoff * 2 ** (self._failures - 1))
+        return backoff * random.uniform(0.5, 1.0)
+
+    def _wait_for_budget(self):
+        delay = self._last_write + self._min_interval - time.monotonic()
+        if delay > 0 and not self._stopping.is_set():
+            time.sleep(delay)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", nargs="?", default="results_outbox.db")
+    parser.add_argument("--requeue-dead", action="store_true", help="make every dead-lettered row pending again")
+    args = parser.parse_args(argv)
+
+    outbox = Outbox(args.path)
+    if args.requeue_dead:
+        print(f"Requeued {outbox.requeue_dead()} dead-lettered rows")
+    print(f"{outbox.pending_count()} rows pending, {outbox.dead_count()} dead-lettered")
+    for row_id, error in outbox.dead_errors():
+        print(f"row {row_id}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Immutable question and style-description structures compiled from raw instrument data.
+
+Choice text is stripped of its "(Style)" suffix and keeps the parsed style
+label. The style matrix derived from those labels must match the scoring
+matrix compiled from the scoring map, so a question edited without its
+scoring row (or the reverse) fails at load instead of mis-scoring respondents.
+"""
+from collections import namedtuple
+from types import MappingProxyType
+
+import numpy as np
+
+from scoring import CHOICE_LETTERS, STYLES, compile_scoring_map
+
+Choice = namedtuple("Choice", "text style")
+Question = namedtuple("Question", "number text choices")
+StyleDescription = namedtuple("StyleDescription", "title keywords behaviors dealing_tips")
+
+
+def parse_choice(raw):
+    """Splits 'Answer text. (Style)' into a Choice."""
+    open_paren_index = raw.rfind(" (")
+    if open_paren_index == -1 or not raw.endswith(")"):
+        raise ValueError(f"choice has no (Style) label: {raw!r}")
+    return Choice(raw[:open_paren_index].strip(), raw[open_paren_index + 2:-1])
+
+
+def compile_questions(raw_questions, mapping):
+    """Builds the immutable question tuple and checks its style labels against the scoring map.
+
+    Returns the questions and the (questions, choices) style matrix.
+    """
+    questions = tuple(
+        Question(number, raw["text"], tuple(parse_choice(choice) for choice in raw["choices"]))
+        for number, raw in enumerate(raw_questions, start=1)
+    )
+    for q in questions:
+        if len(q.choices) != len(CHOICE_LETTERS):
+            raise ValueError(f"Q{q.number} has {len(q.choices)} choices, expected {len(CHOICE_LETTERS)}")
+        unknown = [choice.style for choice in q.choices if choice.style not in STYLES]
+        if unknown:
+            raise ValueError(f"Q{q.number} uses unknown styles {unknown}; expected one of {STYLES}")
+    drift = [
+        f"Q{q.number}{CHOICE_LETTERS[c]}: labelled {choice.style}, scored {mapping.get(q.number, {}).get(CHOICE_LETTERS[c])}"
+        for q in questions
+        for c, choice in enumerate(q.choices)
+        if choice.style != mapping.get(q.number, {}).get(CHOICE_LETTERS[c])
+    ]
+    if drift or len(questions) != len(mapping):
+        raise ValueError(f"questions and scoring_map disagree ({len(questions)} questions, "
+                         f"{len(mapping)} scored): {'; '.join(drift)}")
+    style_matrix = compile_scoring_map(mapping)
+    derived = np.array([[STYLES.index(choice.style) for choice in q.choices] for q in questions])
+    if not np.array_equal(derived, style_matrix):
+        raise ValueError("style matrix derived from the question labels does not match the scoring matrix")
+    return questions, style_matrix
+
+
+def compile_style_descriptions(raw_descriptions):
+    missing = set(STYLES) - set(raw_descriptions)
+    if missing:
+        raise ValueError(f"style_descriptions is missing {sorted(missing)}")
+    return MappingProxyType({
+        style: StyleDescription(info["title"], tuple(info["keywords"]), tuple(info["behaviors"]), tuple(info["dealing_tips"]))
+        for style, info in raw_descriptions.items()
+    })
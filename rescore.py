@@ -0,0 +1,170 @@
+"""Rescores exported result rows with an instrument's current scoring tables, outside Streamlit.
+
+Rows use the Google Sheet layout: timestamp, dominant style, the Driver,
+Analytical, Amiable and Expressive percentages, then the 18 answer letters
+and, for instruments other than the default, the instrument id. Only rows of
+the chosen instrument are rescored; rows of other instruments are written
+through unchanged and counted.
+Input is read and written in fixed-size chunks, so archives of any size run
+in bounded memory:
+
+    python rescore.py results.csv -o rescored.csv --workers 4
+    python rescore.py results.ndjson -o rescored.ndjson
+"""
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from functools import partial
+from itertools import islice
+import json
+import os
+import sys
+
+import numpy as np
+
+from instruments import DEFAULT_INSTRUMENT, INSTRUMENTS_DIR, load_instrument
+from scoring import STYLES, UNANSWERED, score_batch
+from sinks import SHEET_ANSWER_COLUMNS
+
+ANSWER_COLUMN = 2 + len(STYLES)
+INSTRUMENT_COLUMN = ANSWER_COLUMN + SHEET_ANSWER_COLUMNS
+LETTER_INDEX = {letter: i for i, letter in enumerate("ABCD")}
+
+
+def parse_letters(rows, n_questions):
+    """Reads the answer letters of each row into an (N, questions) int8 array."""
+    responses = np.full((len(rows), n_questions), UNANSWERED, dtype=np.int8)
+    for i, row in enumerate(rows):
+        for q, letter in enumerate(row[ANSWER_COLUMN:ANSWER_COLUMN + n_questions]):
+            if letter:
+                try:
+                    responses[i, q] = LETTER_INDEX[letter.strip().upper()]
+                except KeyError:
+                    raise ValueError(f"invalid answer {letter!r} for question {q + 1} in row {row!r}") from None
+    return responses
+
+
+def row_instrument(row):
+    """The instrument cell of a sheet row: None for the default instrument."""
+    return (row[INSTRUMENT_COLUMN] if len(row) > INSTRUMENT_COLUMN else None) or None
+
+
+def rescore_rows(rows, style_matrix, instrument_cell=None):
+    """Returns the rows with dominant style and percentages recomputed from their answers.
+
+    Only rows whose instrument cell is instrument_cell are rescored; the rest
+    are returned unchanged. Answers stay padded to the sheet's answer columns
+    and any cells after them (the instrument id) are kept, so rows line up
+    with build_sheet_row().
+    """
+    n_questions = style_matrix.shape[0]
+    width = max(n_questions, SHEET_ANSWER_COLUMNS)
+    matching = [i for i, row in enumerate(rows) if row_instrument(row) == instrument_cell]
+    counts, dominant = score_batch(parse_letters([rows[i] for i in matching], n_questions), style_matrix)
+    percentages = counts / n_questions * 100
+    rescored = list(rows)
+    for i, row_pcts, row_dominant in zip(matching, percentages, dominant):
+        row = rows[i]
+        answers = list(row[ANSWER_COLUMN:ANSWER_COLUMN + width])
+        answers += [None] * (width - len(answers))
+        rescored[i] = (
+            [row[0] if row else None, " & ".join(s for s, top in zip(STYLES, row_dominant) if top)]
+            + [f"{pct:.1f}%" for pct in row_pcts]
+            + answers
+            + list(row[ANSWER_COLUMN + width:])
+        )
+    return rescored
+
+
+def read_csv(stream):
+    for row in csv.reader(stream):
+        if row:
+            yield [cell or None for cell in row]
+
+
+def read_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def write_csv(stream, rows):
+    csv.writer(stream, lineterminator="\n").writerows(
+        ["" if cell is None else cell for cell in row] for row in rows
+    )
+
+
+def write_ndjson(stream, rows):
+    stream.writelines(json.dumps(row) + "\n" for row in rows)
+
+
+FORMATS = {"csv": (read_csv, write_csv), "ndjson": (read_ndjson, write_ndjson)}
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def rescore_stream(rows, style_matrix, chunk_size=10000, workers=1, instrument_cell=None):
+    """Yields rescored chunks in input order, keeping at most two chunks per worker in flight."""
+    chunks = chunked(rows, chunk_size)
+    rescore = partial(rescore_rows, style_matrix=style_matrix, instrument_cell=instrument_cell)
+    if workers <= 1:
+        yield from map(rescore, chunks)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.submit(rescore, chunk))
+            if len(in_flight) >= 2 * workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def detect_format(path):
+    return "ndjson" if os.path.splitext(path)[1].lower() in (".ndjson", ".jsonl") else "csv"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="CSV or NDJSON export, '-' for stdin")
+    parser.add_argument("-o", "--output", default="-", help="where to write rescored rows (default: stdout)")
+    parser.add_argument("--format", choices=FORMATS, help="input and output format (default: from the input extension)")
+    parser.add_argument("--instrument", default=os.path.join(INSTRUMENTS_DIR, f"{DEFAULT_INSTRUMENT}.json"),
+                        help="instrument file whose scoring tables to use (default: %(default)s)")
+    parser.add_argument("--header", action="store_true", help="copy the first CSV row through unchanged")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    instrument = load_instrument(args.instrument)
+    instrument_cell = None if instrument.id == DEFAULT_INSTRUMENT else instrument.id
+    fmt = args.format or detect_format(args.input)
+    read, write = FORMATS[fmt]
+    source = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    try:
+        rows = read(source)
+        if args.header and fmt == "csv":
+            write(sink, [next(rows, [])])
+        total = skipped = 0
+        for chunk in rescore_stream(rows, instrument.style_matrix, args.chunk_size, args.workers, instrument_cell):
+            write(sink, chunk)
+            total += len(chunk)
+            skipped += sum(row_instrument(row) != instrument_cell for row in chunk)
+        print(f"Rescored {total - skipped} {instrument.id} rows", file=sys.stderr)
+        if skipped:
+            print(f"Copied {skipped} rows of other instruments unchanged", file=sys.stderr)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Process-wide resources of the Streamlit app, and the startup prewarm that builds them.
+
+They live in a module rather than in app.py so the cached instances are the
+same whether a session or server.py's startup hook creates them first.
+"""
+import threading
+import time
+
+import streamlit as st
+
+from aggregates import CohortAggregates
+from charts import CHART_TITLE, HOLE, PULL, STYLE_COLORS, donut_svg
+from instruments import DEFAULT_INSTRUMENT, INSTRUMENTS_DIR, InstrumentRegistry
+from metrics import REGISTRY
+from scoring import STYLES, score_vectors
+from settings import get_setting
+from submissions import make_sink, make_writer
+
+
+@REGISTRY.timed("chart_build_seconds")
+def create_results_donut_chart(scores):
+    import plotly.graph_objects as go
+    fig = go.Figure(data=[go.Pie(
+        labels=list(scores.keys()),
+        values=list(scores.values()),
+        hole=HOLE,
+        marker_colors=[STYLE_COLORS[s] for s in scores.keys()],
+        texttemplate="%{label}<br>%{percent:.1%}",
+        hoverinfo="label+percent+value",
+        textfont_size=14,
+        pull=[PULL if scores[s] == max(scores.values()) else 0 for s in scores.keys()]
+    )])
+    fig.update_layout(
+        title={'text': CHART_TITLE, 'y':0.95, 'x':0.5, 'xanchor': 'center', 'yanchor': 'top', 'font': {'size': 24, 'color': 'var(--primary-color)'}},
+        font=dict(size=14, color='var(--text-color)'),
+        paper_bgcolor='rgba(0,0,0,0)',
+        showlegend=False,
+        height=450,
+        margin=dict(l=20, r=20, t=80, b=20)
+    )
+    return fig
+
+
+@st.cache_resource(max_entries=get_setting("results", "chart_cache_size", 2048), show_spinner=False)
+def cached_results_chart(score_items):
+    """Donut chart for a tuple of (style, score) pairs, built once and shared by every session."""
+    return create_results_donut_chart(dict(score_items))
+
+
+@st.cache_resource(max_entries=get_setting("results", "chart_cache_size", 2048), show_spinner=False)
+def cached_results_svg(score_items):
+    """Inline SVG donut for a tuple of (style, score) pairs, the lightweight alternative to cached_results_chart."""
+    with REGISTRY.timed("chart_build_seconds", renderer="svg"):
+        return donut_svg(dict(score_items))
+
+
+def svg_chart_enabled():
+    """True when [results] chart is "svg" rather than the default interactive "plotly"."""
+    return get_setting("results", "chart", "plotly") == "svg"
+
+
+@st.cache_resource(max_entries=256, show_spinner=False)
+def results_breakdown(instrument_key, dominant_styles, _instrument):
+    """Pre-rendered headline and per-style sections for a tuple of dominant styles.
+
+    instrument_key is the instrument's (id, version), so an edited instrument gets fresh entries.
+    """
+    descriptions = _instrument.style_descriptions
+    if len(dominant_styles) == 1:
+        headline = f'<div class="score-highlight">Your Dominant Style is {descriptions[dominant_styles[0]].title}</div>'
+    else:
+        headline = '<div class="score-highlight">You have a blend of styles!</div>'
+    sections = []
+    for style in dominant_styles:
+        info = descriptions[style]
+        sections.append({
+            "title": info.title,
+            "keywords": f'<div class="keyword-banner"><strong>Keywords:</strong> {", ".join(info.keywords)}</div>',
+            "behaviors": "\n\n".join(f"• {behavior}" for behavior in info.behaviors),
+            "tips": "\n\n".join(f"• {tip}" for tip in info.dealing_tips),
+        })
+    return {"headline": headline, "sections": sections}
+
+
+@st.cache_resource(show_spinner=False)
+def prewarm_results_cache():
+    """Fills the chart and breakdown caches for every possible score vector in a background thread."""
+    instrument = get_instrument_registry().get(DEFAULT_INSTRUMENT)
+    build_chart = cached_results_svg if svg_chart_enabled() else cached_results_chart
+
+    def prewarm():
+        for vector in score_vectors(len(instrument.questions)):
+            score_items = tuple(zip(STYLES, vector))
+            build_chart(score_items)
+            dominant_styles = tuple(s for s, score in score_items if score == max(vector))
+            results_breakdown((instrument.id, instrument.version), dominant_styles, instrument)
+    thread = threading.Thread(target=prewarm, name="results-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+@st.cache_resource(show_spinner=False)
+def get_result_sink():
+    """Process-wide storage sink chosen by [storage] sink: sheets, fake_sheets, sqlite, csv, parquet or response_log."""
+    return make_sink()
+
+
+@st.cache_resource(show_spinner=False)
+def get_sheet_writer():
+    """Starts the process-wide outbox replay worker shared by all sessions."""
+    return make_writer(get_result_sink())
+
+
+@st.cache_resource(show_spinner=False)
+def get_instrument_registry():
+    """Process-wide compiled instruments, reloaded when their files change."""
+    return InstrumentRegistry(get_setting("instruments", "directory", INSTRUMENTS_DIR))
+
+
+@st.cache_resource(show_spinner=False)
+def get_cohort_aggregates():
+    """Process-wide running aggregates for the facilitator dashboard."""
+    return CohortAggregates(get_setting("aggregates", "path", "results_aggregates.db"))
+
+
+def prewarm_instruments():
+    """Compiles every instrument: questions, scoring tables and style descriptions."""
+    registry = get_instrument_registry()
+    for instrument_id in registry.available():
+        registry.get(instrument_id)
+
+
+def prewarm_chart():
+    """Builds one results chart; for Plotly also serializes it, paying the import and template setup."""
+    instrument = get_instrument_registry().get(DEFAULT_INSTRUMENT)
+    vector = next(score_vectors(len(instrument.questions)))
+    score_items = tuple(zip(STYLES, vector))
+    if svg_chart_enabled():
+        cached_results_svg(score_items)
+    else:
+        import plotly.io
+        # Serialized the way st.plotly_chart does it.
+        plotly.io.to_json(cached_results_chart(score_items), validate=False)
+    results_breakdown((instrument.id, instrument.version), (STYLES[0],), instrument)
+
+
+def prewarm_storage():
+    """Opens the outbox and cohort aggregates and connects the sink (for Sheets: authorizes and opens the worksheet)."""
+    get_sheet_writer()
+    get_cohort_aggregates()
+    status = get_result_sink().health()
+    if not status["ok"]:
+        raise RuntimeError(f"{status['sink']} sink unhealthy: {status['detail']}")
+
+
+PREWARM_STEPS = (
+    ("instruments", prewarm_instruments),
+    ("chart", prewarm_chart),
+    ("storage", prewarm_storage),
+)
+
+
+def prewarm():
+    """Runs each startup step once, logging its duration; a failed step is logged and skipped.
+
+    Returns {step: seconds}. With [results] prewarm set, the full chart cache
+    fill is also started in the background.
+    """
+    timings = {}
+    started = time.perf_counter()
+    for name, step in PREWARM_STEPS:
+        step_started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"Prewarm step {name} failed: {type(e).__name__}: {e}")
+        timings[name] = time.perf_counter() - step_started
+        REGISTRY.observe("prewarm_seconds", timings[name], step=name)
+        print(f"Prewarm step {name} took {timings[name] * 1000:.0f} ms")
+    if get_setting("results", "prewarm", False):
+        prewarm_results_cache()
+    print(f"Prewarm finished in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return timings
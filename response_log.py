@@ -0,0 +1,191 @@
+"""Append-only binary log of completed assessments, read back through mmap as a NumPy array.
+
+Each instrument's results go to <directory>/<instrument>.bin: a 16-byte
+header, then one fixed-width record per result (16 bytes for 18 answers)
+holding the timestamp in epoch seconds, the answers packed at 2 bits each
+and a bit mask of the answered questions. Scores are not stored; they follow
+from the answers and the instrument's current scoring tables, so a scan
+decodes the records in vectorized chunks and feeds them to score_batch():
+
+    python response_log.py results_log --import results.csv --header
+    python response_log.py results_log/disc18.bin
+"""
+import argparse
+import fcntl
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from instruments import DEFAULT_INSTRUMENT, InstrumentRegistry
+from rescore import FORMATS, chunked, detect_format, parse_letters
+from scoring import STYLES, UNANSWERED, score_batch
+from sinks import RESULT_COLUMNS, SHEET_ANSWER_COLUMNS, Sink, pad_row
+
+MAGIC = b"PARLOG\x00\x01"
+HEADER = struct.Struct("<8sII")
+SHIFTS = np.array([0, 2, 4, 6], dtype=np.uint8)
+# The four answers packed in each possible byte, so unpacking is a single table lookup.
+UNPACKED = ((np.arange(256, dtype=np.uint8)[:, None] >> SHIFTS) & 3).astype(np.int8)
+
+
+def record_dtype(n_questions=SHEET_ANSWER_COLUMNS):
+    return np.dtype([
+        ("timestamp", "<M8[s]"),
+        ("answers", "u1", (n_questions + 3) // 4),
+        ("answered", "u1", (n_questions + 7) // 8),
+    ])
+
+
+def pack(responses, timestamps):
+    """Packs an (N, questions) array of choice indexes (UNANSWERED when skipped) into log records."""
+    responses = np.asarray(responses, dtype=np.int8)
+    n_rows, n_questions = responses.shape
+    dtype = record_dtype(n_questions)
+    answered = responses != UNANSWERED
+    if ((responses < UNANSWERED) | (responses > 3)).any():
+        raise ValueError(f"choice indexes must be {UNANSWERED} or 0..3")
+    # Four answers per byte, the first in the lowest two bits.
+    padded = np.zeros((n_rows, dtype["answers"].shape[0] * 4), dtype=np.uint8)
+    padded[:, :n_questions] = np.where(answered, responses, 0)
+    padded = padded.reshape(n_rows, -1, 4) << SHIFTS
+    records = np.empty(n_rows, dtype=dtype)
+    records["timestamp"] = timestamps
+    records["answers"] = np.bitwise_or.reduce(padded, axis=2)
+    records["answered"] = np.packbits(answered, axis=1, bitorder="little")
+    return records
+
+
+def unpack(records, n_questions=SHEET_ANSWER_COLUMNS):
+    """Returns the (N, questions) int8 choice indexes of log records, UNANSWERED where skipped."""
+    responses = UNPACKED[records["answers"]].reshape(len(records), -1)[:, :n_questions]
+    answered = np.unpackbits(records["answered"], axis=1, count=n_questions, bitorder="little").astype(bool)
+    responses[~answered] = UNANSWERED
+    return responses
+
+
+def open_log(path):
+    """Maps a log read-only as a structured array of its complete records (no copy is made).
+
+    Records appended after the call are not visible; open the log again to see them.
+    """
+    with open(path, "rb") as f:
+        magic, n_questions, record_size = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a response log")
+        dtype = record_dtype(n_questions)
+        if dtype.itemsize != record_size:
+            raise ValueError(f"{path} has {record_size}-byte records, expected {dtype.itemsize}")
+        count = (os.fstat(f.fileno()).st_size - HEADER.size) // record_size
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=HEADER.size, shape=(count,))
+
+
+def append_records(path, records, n_questions=SHEET_ANSWER_COLUMNS):
+    """Appends records in one write and fsyncs; an flock serializes writers in other processes."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        size = os.fstat(fd).st_size
+        if size < HEADER.size:
+            os.ftruncate(fd, 0)
+            os.write(fd, HEADER.pack(MAGIC, n_questions, records.dtype.itemsize))
+        else:
+            if HEADER.unpack(os.pread(fd, HEADER.size, 0)) != (MAGIC, n_questions, records.dtype.itemsize):
+                raise ValueError(f"{path} is not a response log of {n_questions}-question records")
+            # Drop a record cut short by a crash, so the next ones stay aligned.
+            partial = (size - HEADER.size) % records.dtype.itemsize
+            if partial:
+                os.ftruncate(fd, size - partial)
+        os.write(fd, records.tobytes())
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def rows_to_records(rows):
+    """Converts sheet rows to log records; returns {instrument id: records}."""
+    groups = {}
+    for row in rows:
+        row = pad_row(row)
+        groups.setdefault(row[len(RESULT_COLUMNS) - 1] or DEFAULT_INSTRUMENT, []).append(row)
+    records = {}
+    for instrument_id, group in groups.items():
+        responses = parse_letters(group, SHEET_ANSWER_COLUMNS)
+        timestamps = np.array([row[0] for row in group], dtype="datetime64[s]")
+        records[instrument_id] = pack(responses, timestamps)
+    return records
+
+
+class ResponseLogSink(Sink):
+    """Appends results to one binary response log per instrument."""
+
+    name = "response_log"
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, instrument_id):
+        return os.path.join(self.directory, f"{instrument_id}.bin")
+
+    def append_many(self, rows):
+        for instrument_id, records in rows_to_records(rows).items():
+            append_records(self.path(instrument_id), records)
+
+    def health(self):
+        ok = os.access(self.directory, os.W_OK)
+        return {"sink": self.name, "ok": ok, "detail": self.directory if ok else f"{self.directory} is not writable"}
+
+
+def scan(records, style_matrix, chunk_size=1 << 20):
+    """Yields (timestamps, responses, counts, dominant) for consecutive chunks of log records."""
+    n_questions = style_matrix.shape[0]
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        responses = unpack(chunk, n_questions)
+        counts, dominant = score_batch(responses, style_matrix)
+        yield chunk["timestamp"], responses, counts, dominant
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("log", help="a log file to summarize, or with --import the log directory")
+    parser.add_argument("--import", dest="source", help="CSV or NDJSON export whose rows to append to the logs")
+    parser.add_argument("--header", action="store_true", help="skip the first CSV row of the import")
+    args = parser.parse_args(argv)
+
+    if args.source:
+        sink = ResponseLogSink(args.log)
+        fmt = detect_format(args.source)
+        total = 0
+        with open(args.source, newline="", encoding="utf-8") as f:
+            rows = FORMATS[fmt][0](f)
+            if args.header and fmt == "csv":
+                next(rows, None)
+            for chunk in chunked(rows, 100000):
+                sink.append_many(chunk)
+                total += len(chunk)
+        print(f"Imported {total} rows into {args.log}", file=sys.stderr)
+        return
+
+    instrument = InstrumentRegistry().get(os.path.splitext(os.path.basename(args.log))[0])
+    records = open_log(args.log)
+    started = time.perf_counter()
+    totals = np.zeros(len(STYLES), dtype=np.int64)
+    dominant_counts = np.zeros(len(STYLES), dtype=np.int64)
+    for _, _, counts, dominant in scan(records, instrument.style_matrix):
+        totals += counts.sum(axis=0)
+        dominant_counts += dominant.sum(axis=0)
+    elapsed = time.perf_counter() - started
+    print(f"{len(records)} results ({records.nbytes / 1e6:.1f} MB) scanned in {elapsed:.3f}s")
+    for style, total, dominant in zip(STYLES, totals, dominant_counts):
+        average = total / (len(records) * len(instrument.questions)) * 100 if len(records) else 0.0
+        print(f"{style:<12}dominant (or tied) in {dominant:>10}   average {average:5.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Columnar results store: typed Parquet files partitioned by date, with background compaction.
+
+Each batch from the outbox writer becomes one small file under
+<directory>/date=YYYY-MM-DD/, so appends never rewrite existing data.
+compact() later merges a partition's small files into one file with large
+row groups. Columns are typed (timestamp, float32 percentages, uint8 choice
+index per question, null when unanswered), so a query over a date range
+reads only those partitions and columns:
+
+    python results_store.py results_parquet --compact
+    python results_store.py results_parquet --start 2025-01-01 --end 2025-12-31
+"""
+import argparse
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from datetime import date, datetime
+import fcntl
+import os
+import sys
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from scoring import STYLES
+from sinks import RESULT_COLUMNS, SHEET_ANSWER_COLUMNS, Sink, pad_row
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+ANSWER_LETTERS = "ABCD"
+QUESTION_COLUMNS = RESULT_COLUMNS[2 + len(STYLES):2 + len(STYLES) + SHEET_ANSWER_COLUMNS]
+SCHEMA = pa.schema(
+    [("timestamp", pa.timestamp("s")), ("dominant_style", pa.string())]
+    + [(style, pa.float32()) for style in STYLES]
+    + [(column, pa.uint8()) for column in QUESTION_COLUMNS]
+    + [("instrument", pa.string())]
+)
+# Compacted files list the files they replace, so an interrupted compaction can finish deleting them.
+SOURCES_KEY = b"compacted_from"
+LOCK_NAME = ".compact.lock"
+
+
+def to_table(rows):
+    """Converts sheet rows to a typed Arrow table."""
+    rows = [pad_row(row) for row in rows]
+    columns = list(zip(*rows))
+    arrays = [
+        pa.array([datetime.strptime(value, TIMESTAMP_FORMAT) for value in columns[0]], pa.timestamp("s")),
+        pa.array(columns[1], pa.string()),
+    ]
+    for i in range(len(STYLES)):
+        arrays.append(pa.array([None if v is None else float(str(v).rstrip("%")) for v in columns[2 + i]], pa.float32()))
+    for i in range(SHEET_ANSWER_COLUMNS):
+        arrays.append(pa.array([ANSWER_LETTERS.index(v) if v else None for v in columns[2 + len(STYLES) + i]], pa.uint8()))
+    arrays.append(pa.array(columns[-1], pa.string()))
+    return pa.Table.from_arrays(arrays, schema=SCHEMA)
+
+
+def write_file(table, path, metadata=None, row_group_size=None):
+    """Writes under a temporary name and renames, so readers never see a partial file."""
+    if metadata:
+        table = table.replace_schema_metadata(metadata)
+    pq.write_table(table, path + ".tmp", row_group_size=row_group_size, compression="zstd")
+    os.replace(path + ".tmp", path)
+
+
+class ParquetSink(Sink):
+    """Appends each batch as a small typed Parquet file in its date partition."""
+
+    name = "parquet"
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._sequence = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def append_many(self, rows):
+        table = to_table(rows)
+        days = pc.strftime(table["timestamp"], format="%Y-%m-%d")
+        for day in pc.unique(days).to_pylist():
+            partition = os.path.join(self.directory, f"date={day}")
+            os.makedirs(partition, exist_ok=True)
+            with self._lock:
+                self._sequence += 1
+                name = f"part-{time.time_ns()}-{os.getpid()}-{self._sequence}.parquet"
+            write_file(table.filter(pc.equal(days, day)), os.path.join(partition, name))
+
+    def health(self):
+        ok = os.access(self.directory, os.W_OK)
+        return {"sink": self.name, "ok": ok, "detail": self.directory if ok else f"{self.directory} is not writable"}
+
+
+def partitions(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith("date=") and os.path.isdir(os.path.join(directory, name))
+    )
+
+
+def compact_partition(partition, min_files=8, small_bytes=8 << 20, row_group_size=128 * 1024):
+    """Merges the partition's small files into one; returns the number of files merged.
+
+    An exclusive lock on the partition's lock file keeps two processes from
+    compacting it at once, and waits for readers holding it (see read_lock()).
+    """
+    with open(os.path.join(partition, LOCK_NAME), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        names = sorted(name for name in os.listdir(partition) if name.endswith(".parquet"))
+        for name in names:
+            _finish_compaction(partition, name)
+        small = [
+            name for name in sorted(n for n in os.listdir(partition) if n.endswith(".parquet"))
+            if os.path.getsize(os.path.join(partition, name)) < small_bytes
+        ]
+        if len(small) < min_files:
+            return 0
+        table = pa.concat_tables(pq.read_table(os.path.join(partition, name), schema=SCHEMA) for name in small)
+        table = table.sort_by("timestamp")
+        write_file(
+            table,
+            os.path.join(partition, f"compacted-{time.time_ns()}.parquet"),
+            metadata={SOURCES_KEY: "\n".join(small).encode()},
+            row_group_size=row_group_size,
+        )
+        for name in small:
+            os.remove(os.path.join(partition, name))
+        return len(small)
+
+
+def _finish_compaction(partition, name):
+    """Deletes inputs left behind when a compaction stopped between writing its output and cleaning up."""
+    if not name.startswith("compacted-"):
+        return
+    for source in compacted_sources(os.path.join(partition, name)):
+        path = os.path.join(partition, source)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def compacted_sources(path):
+    """Names of the files a compacted file replaced (none for a batch file)."""
+    metadata = pq.read_schema(path).metadata or {}
+    return [source for source in metadata.get(SOURCES_KEY, b"").decode().split("\n") if source]
+
+
+def compact(directory, **options):
+    """Compacts every partition; returns the number of files merged."""
+    return sum(compact_partition(partition, **options) for partition in partitions(directory))
+
+
+def start_compactor(directory, interval=3600.0, **options):
+    """Runs compact() every interval seconds on a background thread."""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                compact(directory, **options)
+            except (OSError, pa.ArrowException) as e:
+                print(f"Error compacting results in {directory}: {e}")
+
+    thread = threading.Thread(target=run, name="results-compactor", daemon=True)
+    thread.start()
+    return thread
+
+
+def partition_day(partition):
+    return date.fromisoformat(os.path.basename(partition)[len("date="):])
+
+
+@contextmanager
+def read_lock(partitions):
+    """Holds the partitions' compaction locks shared, so no file listed under them is deleted before it is read."""
+    with ExitStack() as stack:
+        for partition in partitions:
+            lock = stack.enter_context(open(os.path.join(partition, LOCK_NAME), "a"))
+            fcntl.flock(lock, fcntl.LOCK_SH)
+        yield
+
+
+def live_files(partition):
+    """Names of the partition's data files, skipping inputs a compaction has merged but not yet deleted."""
+    names = {n for n in os.listdir(partition) if n.endswith(".parquet")}
+    for name in [n for n in names if n.startswith("compacted-")]:
+        names -= set(compacted_sources(os.path.join(partition, name)))
+    return sorted(names)
+
+
+def read_results(directory, start=None, end=None, columns=None):
+    """Reads results between two dates (inclusive) as an Arrow table, opening only those partitions."""
+    selected = [
+        partition for partition in partitions(directory)
+        if (start is None or partition_day(partition) >= start) and (end is None or partition_day(partition) <= end)
+    ]
+    with read_lock(selected):
+        files = [os.path.join(partition, n) for partition in selected for n in live_files(partition)]
+        return ds.dataset(files, schema=SCHEMA, format="parquet").to_table(columns=columns)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--compact", action="store_true", help="merge small files before reporting")
+    parser.add_argument("--start", type=date.fromisoformat)
+    parser.add_argument("--end", type=date.fromisoformat)
+    args = parser.parse_args(argv)
+
+    if args.compact:
+        print(f"Merged {compact(args.directory)} files", file=sys.stderr)
+    table = read_results(args.directory, args.start, args.end, columns=["dominant_style", *STYLES])
+    print(f"{table.num_rows} results")
+    for style, count in Counter(table["dominant_style"].to_pylist()).most_common():
+        print(f"{style:<40}{count:>8}")
+    for style in STYLES:
+        print(f"average {style:<32}{pc.mean(table[style]).as_py() or 0.0:>7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Style names and the vectorized scoring engine."""
+import numpy as np
+
+STYLES = ('Driver', 'Analytical', 'Amiable', 'Expressive')
+CHOICE_LETTERS = 'abcd'
+UNANSWERED = -1
+
+
+def compile_scoring_map(mapping, styles=STYLES):
+    """Turns {question number: {letter: style}} into a (questions, choices) matrix of style indexes."""
+    return np.array(
+        [[styles.index(mapping[q][letter]) for letter in CHOICE_LETTERS] for q in sorted(mapping)],
+        dtype=np.intp,
+    )
+
+
+def to_response_array(responses):
+    """Converts response lists (choice index or None per question) to an int8 array, None as UNANSWERED."""
+    return np.array(
+        [[UNANSWERED if r is None else r for r in row] for row in responses],
+        dtype=np.int8,
+    ).reshape(len(responses), -1)
+
+
+def score_batch(responses, style_matrix):
+    """Scores an (N, questions) array of choice indexes in one pass.
+
+    Unanswered questions are UNANSWERED (-1) and count towards no style.
+    Returns an (N, styles) count matrix and a boolean mask of the same shape
+    marking every style that ties for the highest count in its row.
+    """
+    responses = np.asarray(responses)
+    if responses.ndim != 2 or responses.shape[1] != style_matrix.shape[0]:
+        raise ValueError(f"expected responses of shape (N, {style_matrix.shape[0]}), got {responses.shape}")
+    answered = responses != UNANSWERED
+    if ((responses < UNANSWERED) | (responses >= style_matrix.shape[1])).any():
+        raise ValueError(f"choice indexes must be {UNANSWERED} or 0..{style_matrix.shape[1] - 1}")
+
+    n_rows = responses.shape[0]
+    n_styles = len(STYLES)
+    style_index = style_matrix[np.arange(style_matrix.shape[0]), np.where(answered, responses, 0)]
+    cells = np.arange(n_rows)[:, None] * n_styles + style_index
+    counts = np.bincount(cells[answered], minlength=n_rows * n_styles).reshape(n_rows, n_styles)
+    dominant = counts == counts.max(axis=1, keepdims=True)
+    return counts, dominant
+
+
+def score_vectors(n_questions, n_styles=len(STYLES)):
+    """Yields every possible tuple of per-style counts for a fully answered response set."""
+    if n_styles == 1:
+        yield (n_questions,)
+        return
+    for first in range(n_questions, -1, -1):
+        for rest in score_vectors(n_questions - first, n_styles - 1):
+            yield (first,) + rest
@@ -0,0 +1,25 @@
+"""ASGI entry point that prewarms the process before it serves the app.
+
+Startup compiles the instruments, builds one results chart and connects the
+storage sink (see resources.prewarm()) before the server accepts a
+connection, so the health check only passes once the first respondent would
+be served as fast as any later one. Run it instead of app.py:
+
+    streamlit run server.py
+    uvicorn server:app --port 8501
+"""
+from contextlib import asynccontextmanager
+import os
+
+import streamlit as st
+from starlette.concurrency import run_in_threadpool
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Imported here: the Streamlit runtime and secrets are only ready once startup begins.
+    from resources import prewarm
+    yield {"prewarm_seconds": await run_in_threadpool(prewarm)}
+
+
+app = st.App(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"), lifespan=lifespan)
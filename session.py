@@ -0,0 +1,75 @@
+"""Compact per-session assessment state and a process-wide session size gauge."""
+import sys
+import threading
+import time
+
+UNANSWERED = 0xFF
+WELCOME = -1
+
+
+def new_answers(n_questions):
+    """One byte per question, UNANSWERED until a choice index is stored."""
+    return bytearray([UNANSWERED]) * n_questions
+
+
+def answer_at(answers, question_index):
+    """The 0-based choice for a question, or None if it is unanswered."""
+    value = answers[question_index]
+    return None if value == UNANSWERED else value
+
+
+def answers_to_responses(answers):
+    return [None if value == UNANSWERED else value for value in answers]
+
+
+def state_size(value, _seen=None):
+    """Approximate deep size in bytes of a session state value."""
+    seen = _seen if _seen is not None else set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(state_size(k, seen) + state_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(state_size(item, seen) for item in value)
+    return size
+
+
+class SessionSizes:
+    """Latest state size reported by each session, for capacity planning.
+
+    Sessions report after every run; entries not refreshed within ttl seconds
+    are treated as ended and dropped, by summary() and every prune_every
+    records, so the table stays bounded even when nothing reads it.
+    """
+
+    def __init__(self, ttl=3600.0, prune_every=1000):
+        self._ttl = ttl
+        self._prune_every = prune_every
+        self._lock = threading.Lock()
+        self._sizes = {}
+        self._records = 0
+
+    def record(self, session_id, nbytes):
+        with self._lock:
+            self._sizes[session_id] = (nbytes, time.monotonic())
+            self._records += 1
+            if self._records % self._prune_every == 0:
+                self._prune()
+
+    def summary(self):
+        """Returns the number of live sessions and their total, mean and largest state in bytes."""
+        with self._lock:
+            self._prune()
+            sizes = [nbytes for nbytes, _ in self._sizes.values()]
+        return {
+            "sessions": len(sizes),
+            "total_bytes": sum(sizes),
+            "mean_bytes": sum(sizes) / len(sizes) if sizes else 0,
+            "max_bytes": max(sizes, default=0),
+        }
+
+    def _prune(self):
+        cutoff = time.monotonic() - self._ttl
+        self._sizes = {sid: entry for sid, entry in self._sizes.items() if entry[1] >= cutoff}
@@ -0,0 +1,183 @@
+"""Optional shared store for in-progress assessments, keyed by a resumable session token.
+
+With a store configured, any app replica can pick up a respondent's
+progress from the token in their link, so replicas need no sticky sessions
+and a restart does not lose anyone mid-assessment. Only the keys in
+PERSISTED_KEYS are stored, as a small JSON record with a version number
+that increases on every write.
+"""
+from collections import namedtuple
+import json
+import re
+import secrets
+import socket
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+PERSISTED_KEYS = ("instrument", "cursor", "answers", "data_saved")
+VALID_TOKEN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+SessionRecord = namedtuple("SessionRecord", "version state")
+
+
+class SessionStoreError(Exception):
+    """Error reply from a Redis-protocol server."""
+
+
+def new_token():
+    return secrets.token_urlsafe(16)
+
+
+def snapshot(session_state):
+    """JSON text of the persisted keys present in session_state; answers are stored as hex."""
+    state = {key: session_state[key] for key in PERSISTED_KEYS if key in session_state}
+    if "answers" in state:
+        state["answers"] = bytes(state["answers"]).hex()
+    return json.dumps(state, sort_keys=True, separators=(",", ":"))
+
+
+def restore(session_state, state_json):
+    """Replaces the persisted keys in session_state with those of a snapshot."""
+    state = json.loads(state_json)
+    for key in PERSISTED_KEYS:
+        session_state.pop(key, None)
+    if "answers" in state:
+        state["answers"] = bytearray.fromhex(state["answers"])
+    for key, value in state.items():
+        session_state[key] = value
+
+
+def encode(record):
+    return json.dumps({"version": record.version, "state": record.state})
+
+
+def decode(data):
+    if data is None:
+        return None
+    record = json.loads(data)
+    return SessionRecord(record["version"], record["state"])
+
+
+class SQLiteSessionStore:
+    """Session records in a SQLite database (WAL mode) shared by the replicas on one host or volume."""
+
+    def __init__(self, path, ttl=7 * 24 * 3600, busy_timeout=5.0):
+        self.path = path
+        self._ttl = ttl
+        self._busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS sessions (token TEXT PRIMARY KEY, record TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+
+    def load(self, token):
+        row = self._connection().execute(
+            "SELECT record FROM sessions WHERE token = ? AND expires > ?", (token, time.time())
+        ).fetchone()
+        return decode(row[0]) if row else None
+
+    def save(self, token, record):
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                "INSERT INTO sessions (token, record, expires) VALUES (?, ?, ?)"
+                " ON CONFLICT (token) DO UPDATE SET record = excluded.record, expires = excluded.expires",
+                (token, encode(record), now + self._ttl),
+            )
+            conn.execute("DELETE FROM sessions WHERE expires < ?", (now,))
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self._busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+class RedisSessionStore:
+    """Session records in a Redis-protocol server (Redis, Valkey, KeyDB or fake_redis.py).
+
+    Speaks just enough RESP for GET and SET with an expiry, over one
+    connection per thread that is reopened after a network error.
+    """
+
+    def __init__(self, url="redis://localhost:6379/0", ttl=7 * 24 * 3600, prefix="pa:session:", timeout=2.0):
+        parsed = urlparse(url)
+        self._address = (parsed.hostname or "localhost", parsed.port or 6379)
+        self._password = parsed.password
+        self._db = int(parsed.path.lstrip("/") or 0)
+        self._ttl = int(ttl)
+        self._prefix = prefix
+        self._timeout = timeout
+        self._local = threading.local()
+
+    def load(self, token):
+        return decode(self.command("GET", self._prefix + token))
+
+    def save(self, token, record):
+        self.command("SET", self._prefix + token, encode(record), "EX", str(self._ttl))
+
+    def command(self, *args):
+        """Sends one command and returns its reply, reconnecting once if the connection dropped."""
+        try:
+            return self._roundtrip(self._connection(), args)
+        except OSError:
+            self._close()
+            return self._roundtrip(self._connection(), args)
+
+    def _roundtrip(self, conn, args):
+        sock, reader = conn
+        payload = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg.encode() if isinstance(arg, str) else arg
+            payload += [f"${len(data)}\r\n".encode(), data, b"\r\n"]
+        sock.sendall(b"".join(payload))
+        return read_reply(reader)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection(self._address, self._timeout)
+            conn = (sock, sock.makefile("rb"))
+            if self._password:
+                self._roundtrip(conn, ("AUTH", self._password))
+            if self._db:
+                self._roundtrip(conn, ("SELECT", str(self._db)))
+            self._local.conn = conn
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+
+
+def read_reply(reader):
+    """Reads one RESP reply: simple strings and bulk strings are returned as str, nil as None."""
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("connection closed by the server")
+    kind, body = line[:1], line[1:-2].decode()
+    if kind == b"+":
+        return body
+    if kind == b"-":
+        raise SessionStoreError(body)
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        return data[:-2].decode()
+    if kind == b"*":
+        length = int(body)
+        return None if length < 0 else [read_reply(reader) for _ in range(length)]
+    raise SessionStoreError(f"unexpected reply {line!r}")
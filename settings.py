@@ -0,0 +1,25 @@
+"""Runtime settings shared by the app and its background workers."""
+import os
+
+
+def get_setting(section, key, default=None):
+    """Returns PA_<SECTION>_<KEY> from the environment, then st.secrets[section][key], then the default."""
+    env_value = os.environ.get(f"PA_{section}_{key}".upper())
+    if env_value is not None:
+        return _coerce(env_value, default)
+    try:
+        import streamlit as st
+        return st.secrets[section][key]
+    except (KeyError, FileNotFoundError):
+        return default
+
+
+def _coerce(value, default):
+    """Converts an environment string to the type of the default value."""
+    if isinstance(default, bool):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, float):
+        return float(value)
+    return value
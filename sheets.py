@@ -0,0 +1,121 @@
+"""Google Sheets sink: a shared authorized connection and the sink that appends to its worksheet."""
+from datetime import datetime, timedelta, timezone
+import sqlite3
+import threading
+
+import gspread
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
+
+from sinks import Sink
+
+SPREADSHEET_NAME = "Personality Assessment Results"
+WORKSHEET_NAME = "Sheet1"
+
+
+def is_connection_error(error):
+    """Auth failures and missing spreadsheets mean the cached handles are stale."""
+    if isinstance(error, gspread.exceptions.APIError):
+        return error.code in (401, 403, 404)
+    return isinstance(error, (RefreshError, gspread.exceptions.SpreadsheetNotFound,
+                              gspread.exceptions.WorksheetNotFound))
+
+
+def is_retryable(error):
+    """Quota (429), server-side (5xx), network, stale-connection and database-busy errors are worth retrying."""
+    if is_connection_error(error):
+        return True
+    if isinstance(error, gspread.exceptions.APIError):
+        return error.code == 429 or error.code >= 500
+    return isinstance(error, (OSError, sqlite3.OperationalError))
+
+
+def error_reason(error):
+    """Short label for metrics: the HTTP status of API errors, otherwise the exception type."""
+    if isinstance(error, gspread.exceptions.APIError):
+        return str(error.code)
+    return type(error).__name__
+
+
+class SheetConnection:
+    """Shared authorized client, spreadsheet and worksheet handles.
+
+    The spreadsheet is opened by key; when only a title is configured it is
+    found once by a Drive search and reopened by its key afterwards. The
+    access token is refreshed ahead of expiry, and invalidate() drops every
+    handle so the next call re-authorizes.
+    """
+
+    def __init__(self, load_credentials, spreadsheet_key=None, spreadsheet_name=SPREADSHEET_NAME,
+                 worksheet_name=WORKSHEET_NAME, refresh_margin=300):
+        self._load_credentials = load_credentials
+        self._spreadsheet_key = spreadsheet_key
+        self._spreadsheet_name = spreadsheet_name
+        self._worksheet_name = worksheet_name
+        self._refresh_margin = timedelta(seconds=refresh_margin)
+        self._lock = threading.Lock()
+        self._client = None
+        self._spreadsheet = None
+        self._worksheet = None
+
+    def worksheet(self):
+        """Returns the cached worksheet, connecting or refreshing the token as needed."""
+        with self._lock:
+            if self._worksheet is None:
+                self._connect()
+            elif self._token_expiring():
+                self._client.http_client.auth.refresh(Request())
+            return self._worksheet
+
+    def invalidate(self):
+        """Forgets all handles so the next worksheet() call reconnects."""
+        with self._lock:
+            self._client = None
+            self._spreadsheet = None
+            self._worksheet = None
+
+    def _connect(self):
+        self._client = gspread.service_account_from_dict(dict(self._load_credentials()))
+        if self._spreadsheet_key:
+            self._spreadsheet = self._client.open_by_key(self._spreadsheet_key)
+        else:
+            self._spreadsheet = self._client.open(self._spreadsheet_name)
+            self._spreadsheet_key = self._spreadsheet.id
+        self._worksheet = self._spreadsheet.worksheet(self._worksheet_name)
+
+    def _token_expiring(self):
+        expiry = self._client.expiry
+        if expiry is None:
+            return True
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return expiry - now < self._refresh_margin
+
+
+class SheetsSink(Sink):
+    """Appends rows to the worksheet of a SheetConnection (or a fake_sheets stand-in)."""
+
+    name = "sheets"
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def append_many(self, rows):
+        try:
+            self._connection.worksheet().append_rows(rows)
+        except Exception as e:
+            if is_connection_error(e):
+                self._connection.invalidate()
+            raise
+
+    def is_retryable(self, error):
+        return is_retryable(error)
+
+    def error_reason(self, error):
+        return error_reason(error)
+
+    def health(self):
+        try:
+            self._connection.worksheet()
+        except Exception as e:
+            return {"sink": self.name, "ok": False, "detail": f"{error_reason(e)}: {e}"}
+        return {"sink": self.name, "ok": True, "detail": ""}
@@ -0,0 +1,140 @@
+"""Storage sinks that persist completed result rows for the outbox writer.
+
+A sink takes rows in the Google Sheet layout (see RESULT_COLUMNS) and
+implements append_many(); append(), flush(), health(), is_retryable() and
+error_reason() have defaults. The
+Google Sheets sink lives in sheets.py and the Parquet sink in
+results_store.py; the SQLite and CSV sinks here suit deployments that don't
+need Sheets, offline load tests and benchmarks. Rows only count as delivered
+once append_many() returns, so every sink makes a batch durable before
+returning.
+"""
+from abc import ABC, abstractmethod
+import csv
+import os
+import sqlite3
+import threading
+import time
+
+from scoring import STYLES
+
+SHEET_ANSWER_COLUMNS = 18
+RESULT_COLUMNS = (
+    ("timestamp", "dominant_style") + STYLES
+    + tuple(f"q{n}" for n in range(1, SHEET_ANSWER_COLUMNS + 1)) + ("instrument",)
+)
+
+
+def pad_row(row):
+    """Pads a sheet row to RESULT_COLUMNS; rows of the default instrument have no instrument cell."""
+    if len(row) > len(RESULT_COLUMNS):
+        raise ValueError(f"row has {len(row)} cells, expected at most {len(RESULT_COLUMNS)}")
+    return list(row) + [None] * (len(RESULT_COLUMNS) - len(row))
+
+
+class Sink(ABC):
+    """Base class for result sinks; subclasses implement append_many()."""
+
+    name = "sink"
+
+    def append(self, row):
+        self.append_many([row])
+
+    @abstractmethod
+    def append_many(self, rows):
+        """Makes rows durable in one batch; raises to leave them in the outbox for retry."""
+
+    def flush(self):
+        """Forces buffered rows to storage; a no-op for sinks that write through."""
+
+    def is_retryable(self, error):
+        """Network, filesystem and database-busy errors are worth retrying; sinks add their own."""
+        return isinstance(error, (OSError, sqlite3.OperationalError))
+
+    def error_reason(self, error):
+        """Short label for metrics, by default the exception type."""
+        return type(error).__name__
+
+    def health(self):
+        """Returns {"sink": name, "ok": bool, "detail": str} without writing any rows."""
+        return {"sink": self.name, "ok": True, "detail": ""}
+
+
+class SQLiteSink(Sink):
+    """Appends rows to a results table in a SQLite database (WAL mode), one transaction per batch."""
+
+    name = "sqlite"
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self._busy_timeout = busy_timeout
+        self._local = threading.local()
+        quoted = [f'"{column}"' for column in RESULT_COLUMNS]
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS results (id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL, "
+            + ", ".join(f"{column} TEXT" for column in quoted) + ")"
+        )
+        self._insert = (
+            f"INSERT INTO results (created, {', '.join(quoted)}) VALUES (?{', ?' * len(RESULT_COLUMNS)})"
+        )
+
+    def append_many(self, rows):
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("BEGIN")
+            conn.executemany(self._insert, [[now] + pad_row(row) for row in rows])
+
+    def count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def health(self):
+        try:
+            self._connection().execute("SELECT 1 FROM results LIMIT 1").fetchall()
+        except sqlite3.Error as e:
+            return {"sink": self.name, "ok": False, "detail": str(e)}
+        return {"sink": self.name, "ok": True, "detail": self.path}
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self._busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+class CSVSink(Sink):
+    """Appends rows to a CSV file, writing the header when the file is new and syncing every batch."""
+
+    name = "csv"
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def append_many(self, rows):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", newline="", encoding="utf-8")
+                if self._file.tell() == 0:
+                    csv.writer(self._file).writerow(RESULT_COLUMNS)
+            csv.writer(self._file).writerows(
+                ["" if cell is None else cell for cell in pad_row(row)] for row in rows
+            )
+            self._sync()
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+
+    def health(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        ok = os.access(self.path if os.path.exists(self.path) else directory, os.W_OK)
+        return {"sink": self.name, "ok": ok, "detail": self.path if ok else f"{self.path} is not writable"}
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
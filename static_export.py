@@ -0,0 +1,72 @@
+"""Exports an instrument as a self-contained HTML page that runs and scores the assessment in the browser.
+
+The page needs no server until the respondent finishes; it then POSTs one
+result to the API's /results endpoint, which rescores and saves it. Host the
+file anywhere (a CDN, the API's /questionnaire/<id> route, a kiosk's disk):
+
+    python static_export.py --submit-url https://example.org/api/results -o questionnaire.html
+    python static_export.py --instrument short --submit-url /results -o short.html
+"""
+import argparse
+import html
+import json
+import os
+import re
+import sys
+
+from instruments import DEFAULT_INSTRUMENT, InstrumentRegistry
+from scoring import STYLES
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "questionnaire.html")
+PLACEHOLDER = re.compile(r"__(TITLE|INSTRUMENT|SUBMIT_URL)__")
+
+
+def bundle_data(instrument):
+    """The parts of an instrument the page needs, as plain JSON-serializable values."""
+    return {
+        "id": instrument.id,
+        "version": instrument.version,
+        "title": instrument.title,
+        "styles": list(STYLES),
+        "questions": [{"text": q.text, "choices": [choice.text for choice in q.choices]} for q in instrument.questions],
+        "style_matrix": instrument.style_matrix.tolist(),
+        "style_descriptions": {style: info._asdict() for style, info in instrument.style_descriptions.items()},
+    }
+
+
+def _script_json(value):
+    # "</" would end the enclosing <script> element early.
+    return json.dumps(value, ensure_ascii=False).replace("</", "<\\/")
+
+
+def render_bundle(instrument, submit_url):
+    """Returns the questionnaire page for an instrument, posting results to submit_url."""
+    with open(TEMPLATE, encoding="utf-8") as f:
+        template = f.read()
+    values = {
+        "TITLE": html.escape(instrument.title),
+        "INSTRUMENT": _script_json(bundle_data(instrument)),
+        "SUBMIT_URL": _script_json(submit_url),
+    }
+    # One pass, so placeholder-like text inside the instrument is never substituted.
+    return PLACEHOLDER.sub(lambda match: values[match.group(1)], template)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--instrument", default=DEFAULT_INSTRUMENT, help="instrument id (default: %(default)s)")
+    parser.add_argument("--submit-url", required=True, help="URL of the API's /results endpoint")
+    parser.add_argument("-o", "--output", default="-", help="where to write the page (default: stdout)")
+    args = parser.parse_args(argv)
+
+    page = render_bundle(InstrumentRegistry().get(args.instrument), args.submit_url)
+    if args.output == "-":
+        sys.stdout.write(page)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(page)
+        print(f"Wrote {args.output} ({len(page.encode()) / 1024:.1f} KiB)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
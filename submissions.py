@@ -0,0 +1,162 @@
+"""Scoring and persistence of completed assessments, shared by the Streamlit app and the HTTP API."""
+from datetime import datetime
+import sqlite3
+
+from instruments import DEFAULT_INSTRUMENT
+from metrics import REGISTRY
+from outbox import Outbox, SheetWriter
+from scoring import STYLES, score_batch, to_response_array
+from settings import get_setting
+from sinks import SHEET_ANSWER_COLUMNS, CSVSink, SQLiteSink
+
+DEFAULT_COHORT = "default"
+
+
+def cohort_name(instrument, cohort=DEFAULT_COHORT):
+    """Cohorts are kept apart per non-default instrument."""
+    return cohort if instrument.id == DEFAULT_INSTRUMENT else f"{cohort} ({instrument.id})"
+
+
+def result_data(instrument, responses, timestamp=None):
+    """Scores one response list and returns the style counts and the record saved for it."""
+    counts, _ = score_batch(to_response_array([responses]), instrument.style_matrix)
+    scores = dict(zip(STYLES, counts[0].tolist()))
+    max_score = max(scores.values())
+    total_questions = len(instrument.questions)
+    data = {
+        "timestamp": (timestamp or datetime.now()).strftime("%Y-%m-%d %H:%M:%S"),
+        "dominant_style": " & ".join(s for s, score in scores.items() if score == max_score),
+        "scores": {style: f"{(score / total_questions) * 100:.1f}%" for style, score in scores.items()},
+        "responses": [chr(65 + r) if r is not None else None for r in responses],
+        "instrument": instrument.id if instrument.id != DEFAULT_INSTRUMENT else None,
+    }
+    return scores, data
+
+
+def build_sheet_row(data):
+    """Flattens a result into the Google Sheet column layout.
+
+    Answers are padded to SHEET_ANSWER_COLUMNS. Results from an instrument
+    other than the default carry its id in the column after the answers.
+    """
+    responses = data.get("responses", [])
+    instrument = data.get("instrument")
+    return [
+        data.get("timestamp"),
+        data.get("dominant_style"),
+        data.get("scores", {}).get("Driver"),
+        data.get("scores", {}).get("Analytical"),
+        data.get("scores", {}).get("Amiable"),
+        data.get("scores", {}).get("Expressive"),
+    ] + responses + [None] * (SHEET_ANSWER_COLUMNS - len(responses)) + ([instrument] if instrument else [])
+
+
+def record_result(writer, aggregates, instrument, responses, cohort=DEFAULT_COHORT, timestamp=None):
+    """Commits one result to the outbox and the cohort aggregates; returns its record.
+
+    Outbox errors (sqlite3.Error) propagate, as the result is not saved;
+    aggregate errors are only printed.
+    """
+    scores, data = result_data(instrument, responses, timestamp)
+    try:
+        writer.enqueue(build_sheet_row(data))
+    except sqlite3.Error:
+        REGISTRY.inc("submission_failures_total")
+        raise
+    REGISTRY.inc("submissions_total")
+    try:
+        aggregates.record(cohort_name(instrument, cohort), scores, data["dominant_style"], responses)
+    except sqlite3.Error as e:
+        print(f"Error updating cohort aggregates: {e}")
+    return data
+
+
+def score_results(instrument, responses, cohorts, timestamps):
+    """Scores an (N, questions) array of choice indexes in one pass.
+
+    Returns the sheet rows and the (cohort, scores, dominant_style, responses)
+    entries for CohortAggregates.record_many().
+    """
+    counts, dominant = score_batch(responses, instrument.style_matrix)
+    percentages = counts / len(instrument.questions) * 100
+    instrument_id = instrument.id if instrument.id != DEFAULT_INSTRUMENT else None
+    rows, entries = [], []
+    for row_responses, row_counts, row_pcts, row_dominant, cohort, timestamp in zip(
+            responses.tolist(), counts.tolist(), percentages, dominant, cohorts, timestamps):
+        dominant_style = " & ".join(s for s, top in zip(STYLES, row_dominant) if top)
+        rows.append(build_sheet_row({
+            "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            "dominant_style": dominant_style,
+            "scores": {style: f"{pct:.1f}%" for style, pct in zip(STYLES, row_pcts)},
+            "responses": [chr(65 + r) for r in row_responses],
+            "instrument": instrument_id,
+        }))
+        entries.append((cohort_name(instrument, cohort), dict(zip(STYLES, row_counts)), dominant_style, row_responses))
+    return rows, entries
+
+
+def save_results(writer, aggregates, rows, entries):
+    """Commits scored results to the outbox in one transaction, then to the cohort aggregates in another."""
+    try:
+        writer.enqueue_many(rows)
+    except sqlite3.Error:
+        REGISTRY.inc("submission_failures_total", len(rows))
+        raise
+    REGISTRY.inc("submissions_total", len(rows))
+    try:
+        aggregates.record_many(entries)
+    except sqlite3.Error as e:
+        print(f"Error updating cohort aggregates: {e}")
+
+
+def load_service_account():
+    import streamlit as st
+    return st.secrets["gcp_service_account"]
+
+
+def make_sink(load_credentials=load_service_account):
+    """Storage sink chosen by [storage] sink: sheets, fake_sheets, sqlite, csv, parquet or response_log."""
+    kind = get_setting("storage", "sink", "sheets")
+    if kind == "sqlite":
+        return SQLiteSink(get_setting("storage", "path", "results.db"))
+    if kind == "csv":
+        return CSVSink(get_setting("storage", "path", "results.csv"))
+    if kind == "parquet":
+        from results_store import ParquetSink, start_compactor
+        sink = ParquetSink(get_setting("storage", "path", "results_parquet"))
+        start_compactor(sink.directory, get_setting("storage", "compact_interval", 3600.0))
+        return sink
+    if kind == "response_log":
+        from response_log import ResponseLogSink
+        return ResponseLogSink(get_setting("storage", "path", "results_log"))
+    from sheets import SheetConnection, SheetsSink, SPREADSHEET_NAME, WORKSHEET_NAME
+    if kind == "fake_sheets":
+        from fake_sheets import FakeSheetsConnection
+        return SheetsSink(FakeSheetsConnection(
+            latency=get_setting("storage", "fake_latency", 0.2),
+            writes_per_minute=get_setting("storage", "fake_writes_per_minute", 60),
+            error_rate=get_setting("storage", "fake_error_rate", 0.0),
+        ))
+    if kind != "sheets":
+        raise ValueError(f"unknown [storage] sink {kind!r}")
+    return SheetsSink(SheetConnection(
+        load_credentials,
+        spreadsheet_key=get_setting("sheets", "spreadsheet_key"),
+        spreadsheet_name=get_setting("sheets", "spreadsheet_name", SPREADSHEET_NAME),
+        worksheet_name=get_setting("sheets", "worksheet", WORKSHEET_NAME),
+    ))
+
+
+def make_writer(sink):
+    """Starts the outbox replay worker that delivers rows to the sink."""
+    writer = SheetWriter(
+        sink,
+        Outbox(get_setting("outbox", "path", "results_outbox.db")),
+        # Only Sheets needs the writes spaced out to stay within its quota.
+        writes_per_minute=get_setting("sheets", "writes_per_minute", 50) if sink.name == "sheets" else 6000,
+        batch_size=get_setting("sheets", "batch_size", 500),
+        replay_interval=get_setting("outbox", "replay_interval", 30.0),
+        flush_timeout=get_setting("sheets", "flush_timeout", 10.0),
+    )
+    REGISTRY.gauge("sheet_queue_depth", writer.pending)
+    return writer